@@ -8,64 +8,236 @@ For each podcast episode:
 * Download the raw mp3/m4a file
 * Convert it to a 16k mono wav file
 # Remove the original file
+
+Downloads run on a bounded pool of connections and transcoding on a separate pool of processes.
+Interrupted downloads resume from their .part file, failed requests are retried with backoff, and
+every finished episode is recorded in manifest.jsonl in the wav directory (size, SHA-256, duration).
 """
 
 import os
 import pathlib
-import subprocess
+import sys
+import hashlib
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 import numpy as np
+import soundfile as sf
 
-import argparse
-
-parser = argparse.ArgumentParser(description='Download raw audio files for SEP-28k or FluencyBank and convert to 16k hz mono wavs.')
-parser.add_argument('--episodes', type=str, required=True,
-                   help='Path to the labels csv files (e.g., SEP-28k_episodes.csv)')
-parser.add_argument('--wavs', type=str, default="wavs",
-                   help='Path where audio files from download_audio.py are saved')
-
-
-args = parser.parse_args()
-episode_uri = args.episodes
-wav_dir = args.wavs
-
-# Load episode data
-table = np.loadtxt(episode_uri, dtype=str, delimiter=",")
-urls = table[:,2]
-n_items = len(urls)
-
-audio_types = [".mp3", ".m4a", ".mp4"]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio_loader
 
-for i in range(n_items):
-	show_abrev = table[i,-2]
-	ep_idx = table[i,-1]
-	episode_url = table[i,2]
-
-	ext = ''
-	for ext in audio_types:
-		if ext in episode_url:
-			break
-
-	episode_dir = pathlib.Path(f"{wav_dir}/{show_abrev}/")
-	os.makedirs(episode_dir, exist_ok=True)
-
-	audio_path_orig = pathlib.Path(f"{episode_dir}/{ep_idx}{ext}")
-	wav_path = pathlib.Path(f"{episode_dir}/{ep_idx}.wav")
-
-	# Check if this file has already been downloaded
-	if os.path.exists(wav_path):
-		continue
-
-	print("Processing", show_abrev, ep_idx)
-	if not os.path.exists(audio_path_orig):
-		line = f"wget -O {audio_path_orig} {episode_url}"
-		process = subprocess.Popen([(line)],shell=True)
-		process.wait()
-
-	# Convert to 16khz mono wav file
-	line = f"ffmpeg -i {audio_path_orig} -ac 1 -ar 16000 {wav_path}"
-	process = subprocess.Popen([(line)],shell=True)
-	process.wait()
+import argparse
 
-	# Remove the original mp3/m4a file
-	os.remove(audio_path_orig)
\ No newline at end of file
+AUDIO_TYPES = [".mp3", ".m4a", ".mp4"]
+BLOCK_SIZE = 1 << 20
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+def episode_jobs(table, wav_dir):
+	"""Returns one (show_abrev, ep_idx, url, original path, wav path) tuple per row of the episode table."""
+	jobs = []
+	for row in table:
+		show_abrev, ep_idx, episode_url = row[-2], row[-1], row[2]
+
+		ext = ''
+		for ext in AUDIO_TYPES:
+			if ext in episode_url:
+				break
+
+		episode_dir = pathlib.Path(f"{wav_dir}/{show_abrev}/")
+		jobs.append((show_abrev, ep_idx, episode_url, episode_dir / f"{ep_idx}{ext}", episode_dir / f"{ep_idx}.wav"))
+	return jobs
+
+def load_manifest(manifest_path):
+	"""Returns the manifest entries of completed episodes keyed by 'show/episode'."""
+	completed = {}
+	if os.path.exists(manifest_path):
+		with open(manifest_path, 'r') as file:
+			for line in file:
+				if line.strip():
+					entry = json.loads(line)
+					completed[f"{entry['show']}/{entry['episode']}"] = entry
+	return completed
+
+def load_checksums(checksum_path):
+	"""Reads expected SHA-256 digests in sha256sum format ('<digest>  <show>/<episode><ext>')."""
+	checksums = {}
+	with open(checksum_path, 'r') as file:
+		for line in file:
+			if line.strip():
+				digest, name = line.split(maxsplit=1)
+				checksums[name.strip().lstrip('*')] = digest.lower()
+	return checksums
+
+def download_file(url, path, expected_sha256=None, retries=5, backoff=1.0, timeout=60):
+	"""Downloads url to path, resuming a partial download, and returns (bytes, sha256).
+
+	The body is written to path + '.part' and only renamed once its size matches the server's and its
+	digest matches expected_sha256 (when given). Network errors and retryable HTTP statuses are retried
+	with exponential backoff and jitter.
+	"""
+	part_path = pathlib.Path(f"{path}.part")
+	for attempt in range(retries + 1):
+		try:
+			offset = part_path.stat().st_size if part_path.exists() else 0
+			request = urllib.request.Request(url, headers={'Range': f"bytes={offset}-"} if offset else {})
+			with urllib.request.urlopen(request, timeout=timeout) as response:
+				if offset and response.status != 206:
+					# The server ignored the range request, so start over
+					offset = 0
+				length = response.headers.get('Content-Length')
+				expected_size = offset + int(length) if length is not None else None
+
+				hasher = hashlib.sha256()
+				with open(part_path, 'r+b' if offset else 'wb') as file:
+					if offset:
+						# Hash the bytes kept from the previous attempt before appending
+						for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+							hasher.update(block)
+					for block in iter(lambda: response.read(BLOCK_SIZE), b''):
+						hasher.update(block)
+						file.write(block)
+					size = file.tell()
+
+			if expected_size is not None and size != expected_size:
+				raise IOError(f"Expected {expected_size} bytes, got {size}")
+			digest = hasher.hexdigest()
+			if expected_sha256 is not None and digest != expected_sha256:
+				part_path.unlink()
+				raise IOError(f"Checksum mismatch: expected {expected_sha256}, got {digest}")
+			os.replace(part_path, path)
+			return size, digest
+		except urllib.error.HTTPError as e:
+			if e.code == 416:
+				# The partial file is already complete or corrupt; restart from scratch
+				part_path.unlink(missing_ok=True)
+			elif e.code not in RETRY_STATUS:
+				raise
+			error = e
+		except (urllib.error.URLError, IOError, TimeoutError) as e:
+			error = e
+		if attempt < retries:
+			time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+	raise error
+
+def existing_download(path, expected_sha256=None):
+	"""Returns (bytes, sha256) of an already downloaded original, or None if it is missing or fails its checksum."""
+	if not os.path.exists(path):
+		return None
+	hasher = hashlib.sha256()
+	with open(path, 'rb') as file:
+		for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+			hasher.update(block)
+	digest = hasher.hexdigest()
+	if expected_sha256 is not None and digest != expected_sha256:
+		return None
+	return os.path.getsize(path), digest
+
+def fetch_original(url, path, expected_sha256=None, retries=5):
+	"""Returns (bytes, sha256) of the original, reusing a finished download (e.g. from --keep-original) instead of fetching it again."""
+	existing = existing_download(path, expected_sha256)
+	if existing is not None:
+		print(f"Reusing {path}")
+		return existing
+	return download_file(url, path, expected_sha256, retries)
+
+def transcode_to_wav(audio_path, wav_path, sr=16000):
+	"""Decodes an audio file and writes it as a 16-bit mono wav at sr, returning its duration in seconds.
+
+	The audio is decoded, resampled and written a block at a time, so memory use does not grow with the episode length.
+	"""
+	orig_sr, blocks = audio_loader.open_mono_blocks(audio_path)
+	temp_path = pathlib.Path(f"{wav_path}.tmp")
+	with sf.SoundFile(temp_path, 'w', sr, 1, subtype='PCM_16', format='WAV') as file:
+		for block in audio_loader.resample_blocks(blocks, orig_sr, sr):
+			file.write(block)
+		frames = file.frames
+	os.replace(temp_path, wav_path)
+	return frames / sr
+
+def download_episodes(table, wav_dir, connections=8, transcode_workers=None, checksums=None, keep_original=False, retries=5):
+	"""Downloads and transcodes every episode without a finished wav and returns the number of failures."""
+	manifest_path = os.path.join(wav_dir, "manifest.jsonl")
+	completed = load_manifest(manifest_path)
+	checksums = checksums or {}
+
+	pending = []
+	for job in episode_jobs(table, wav_dir):
+		wav_path = job[-1]
+		# Check if this file has already been downloaded; wavs are only renamed into place once complete
+		if os.path.exists(wav_path):
+			continue
+		os.makedirs(wav_path.parent, exist_ok=True)
+		pending.append(job)
+	print(f"{len(pending)} episodes to process, {len(table) - len(pending)} already done ({len(completed)} in the manifest)")
+
+	failures = 0
+	with ThreadPoolExecutor(max_workers=connections) as downloads, ProcessPoolExecutor(max_workers=transcode_workers) as transcodes, \
+			open(manifest_path, 'a') as manifest:
+		download_futures = {}
+		for job in pending:
+			show_abrev, ep_idx, episode_url, audio_path_orig, _ = job
+			expected_sha256 = checksums.get(f"{show_abrev}/{audio_path_orig.name}")
+			download_futures[downloads.submit(fetch_original, episode_url, audio_path_orig, expected_sha256, retries)] = job
+
+		transcode_futures = {}
+		for future in as_completed(download_futures):
+			job = download_futures[future]
+			show_abrev, ep_idx, episode_url, audio_path_orig, wav_path = job
+			try:
+				size, digest = future.result()
+			except Exception as e:
+				print(f"Failed to download {show_abrev} {ep_idx}: {e}")
+				failures += 1
+				continue
+			print("Downloaded", show_abrev, ep_idx)
+			transcode_futures[transcodes.submit(transcode_to_wav, audio_path_orig, wav_path)] = (job, size, digest)
+
+		for future in as_completed(transcode_futures):
+			(show_abrev, ep_idx, episode_url, audio_path_orig, wav_path), size, digest = transcode_futures[future]
+			try:
+				duration = future.result()
+			except Exception as e:
+				print(f"Failed to convert {show_abrev} {ep_idx}: {e}")
+				failures += 1
+				continue
+			manifest.write(json.dumps({'show': str(show_abrev), 'episode': str(ep_idx), 'url': str(episode_url), 'bytes': size,
+									   'sha256': digest, 'wav': str(wav_path), 'seconds': duration}) + "\n")
+			manifest.flush()
+
+			# Remove the original mp3/m4a file
+			if not keep_original:
+				os.remove(audio_path_orig)
+
+	return failures
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Download raw audio files for SEP-28k or FluencyBank and convert to 16k hz mono wavs.')
+	parser.add_argument('--episodes', type=str, required=True,
+					   help='Path to the labels csv files (e.g., SEP-28k_episodes.csv)')
+	parser.add_argument('--wavs', type=str, default="wavs",
+					   help='Path where audio files from download_audio.py are saved')
+	parser.add_argument('--connections', type=int, default=8,
+					   help='Number of simultaneous downloads')
+	parser.add_argument('--transcode-workers', type=int, default=None,
+					   help='Number of processes converting downloads to wav (default: all cores)')
+	parser.add_argument('--retries', type=int, default=5,
+					   help='Retries per download before giving up on an episode')
+	parser.add_argument('--checksums', type=str, default=None,
+					   help='Optional sha256sum-style file of expected digests for <show>/<episode><ext>')
+	parser.add_argument('--keep-original', action='store_true',
+					   help='Keep the downloaded mp3/m4a files after conversion')
+
+	args = parser.parse_args()
+
+	# Load episode data
+	table = np.loadtxt(args.episodes, dtype=str, delimiter=",", ndmin=2)
+	checksums = load_checksums(args.checksums) if args.checksums else None
+
+	failures = download_episodes(table, args.wavs, args.connections, args.transcode_workers, checksums, args.keep_original, args.retries)
+	if failures:
+		print(f"{failures} episodes failed; rerun to retry them")
@@ -6,69 +6,108 @@
 """
 For each podcast episode:
 * Get all clip information for that episode
-* Save each clip as a new wav file.
+* Save each clip as a new wav file, or into one packed clip archive.
+
+Each episode wav is opened memory-mapped, so only the samples of its clips are read, and episodes are
+processed in parallel. With --packed, all clips are written into a single int16 .npy file alongside
+an index CSV of each clip's offset and length, instead of one small wav file per clip.
 """
 
 import os
 import pathlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 import pandas as pd
 from scipy.io import wavfile
 import argparse
 
-parser = argparse.ArgumentParser(description='Extract clips from SEP-28k or FluencyBank.')
-parser.add_argument('--labels', type=str, required=True,
-                    help='Path to the labels csv files (e.g., SEP-28k_labels.csv)')
-parser.add_argument('--wavs', type=str, default="wavs",
-                    help='Path where audio files from download_audio.py are saved')
-parser.add_argument('--clips', type=str, default="clips",
-                    help='Path where clips should be extracted')
-parser.add_argument("--progress", action="store_true",
-                    help="Show progress")
-
-args = parser.parse_args()
-label_file = args.labels
-data_dir = args.wavs
-output_dir = args.clips
-
-data = pd.read_csv(label_file, dtype={"EpId": str})
-
-shows = data['Show']
-episodes = data['EpId']
-clip_idxs = data['ClipId']
-starts = data['Start']
-stops = data['Stop']
-
-n_items = len(shows)
-
-loaded_wav = ""
-cur_iter = range(n_items)
-if args.progress:
-    from tqdm import tqdm
-    cur_iter = tqdm(cur_iter)
-
-for i in cur_iter:
-    clip_idx = clip_idxs[i]
-    show_abrev = shows[i]
-    episode = episodes[i].strip()
-
-    wav_path = pathlib.Path(data_dir, shows[i], f"{episode}.wav")
-    clip_dir = pathlib.Path(output_dir, show_abrev, episode)
-    clip_path = clip_dir / f"{shows[i]}_{episode}_{clip_idx}.wav"
-
-    if not os.path.exists(wav_path):
+PACKED_AUDIO = "clips.npy"
+PACKED_INDEX = "clips_index.csv"
+
+def extract_episode(wav_path, clips, output_dir, packed_path=None):
+    """Cuts the (clip_idx, start, stop, offset) clips out of one episode and returns the number of samples written per clip.
+
+    Clips are written as wav files under output_dir, or, given packed_path, into the packed archive at their offsets.
+    """
+    sample_rate, audio = wavfile.read(wav_path, mmap=True)
+    assert sample_rate == 16000, "Sample rate must be 16 kHz"
+
+    show_abrev, episode = wav_path.parent.name, wav_path.stem
+    packed = np.load(packed_path, mmap_mode='r+') if packed_path is not None else None
+    if packed is not None:
+        assert audio.dtype == np.int16, "Packed archives hold 16-bit PCM"
+    else:
+        clip_dir = pathlib.Path(output_dir, show_abrev, episode)
+        os.makedirs(clip_dir, exist_ok=True)
+
+    lengths = []
+    for clip_idx, start, stop, offset in clips:
+        clip = audio[start:stop]
+        if packed is not None:
+            packed[offset:offset + len(clip)] = clip
+        else:
+            wavfile.write(clip_dir / f"{show_abrev}_{episode}_{clip_idx}.wav", sample_rate, np.array(clip))
+        lengths.append(len(clip))
+
+    if packed is not None:
+        packed.flush()
+    return lengths
+
+def extract_clips(data, data_dir, output_dir, packed=False, n_workers=None, progress=False):
+    """Extracts every labelled clip, grouped by episode, and returns the label rows that were extracted.
+
+    With packed=True the returned rows carry the Offset and Length of each clip in the archive, and are also
+    written to the archive index.
+    """
+    data = data.assign(EpId=data['EpId'].str.strip())
+    data['WavPath'] = [pathlib.Path(data_dir, show, f"{episode}.wav") for show, episode in zip(data['Show'], data['EpId'])]
+    exists = {wav_path: os.path.exists(wav_path) for wav_path in data['WavPath'].unique()}
+    for wav_path in sorted(wav_path for wav_path, found in exists.items() if not found):
         print("Missing", wav_path)
-        continue
+    # Sort by episode so each episode's clips are contiguous in the packed archive
+    data = data[data['WavPath'].map(exists)].sort_values(['Show', 'EpId'], kind='stable').reset_index(drop=True)
+
+    # Reserve space for every clip up front so episodes can be written in parallel
+    data['Offset'] = np.concatenate([[0], np.cumsum(data['Stop'] - data['Start'])[:-1]]).astype(np.int64)
+    packed_path = None
+    os.makedirs(output_dir, exist_ok=True)
+    if packed:
+        packed_path = os.path.join(output_dir, PACKED_AUDIO)
+        np.lib.format.open_memmap(packed_path, mode='w+', dtype=np.int16, shape=(int((data['Stop'] - data['Start']).sum()),)).flush()
 
-    os.makedirs(clip_dir, exist_ok=True)
+    data['Length'] = 0
+    episodes = data.groupby('WavPath', sort=False).indices
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(extract_episode, wav_path, data.loc[rows, ['ClipId', 'Start', 'Stop', 'Offset']].values.tolist(),
+                                   output_dir, packed_path): rows
+                   for wav_path, rows in episodes.items()}
+        completed = as_completed(futures)
+        if progress:
+            from tqdm import tqdm
+            completed = tqdm(completed, total=len(futures))
+        for future in completed:
+            data.loc[futures[future], 'Length'] = future.result()
 
-    # For efficiency reasons, don't reload if file is already opened.
-    if str(wav_path) != loaded_wav:
-        sample_rate, audio = wavfile.read(wav_path)
-        assert sample_rate == 16000, "Sample rate must be 16 kHz"
+    data = data.drop(columns='WavPath')
+    if packed:
+        data.to_csv(os.path.join(output_dir, PACKED_INDEX), index=False)
+    return data
 
-        # Keep track of the open file
-        loaded_wav = str(wav_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Extract clips from SEP-28k or FluencyBank.')
+    parser.add_argument('--labels', type=str, required=True,
+                        help='Path to the labels csv files (e.g., SEP-28k_labels.csv)')
+    parser.add_argument('--wavs', type=str, default="wavs",
+                        help='Path where audio files from download_audio.py are saved')
+    parser.add_argument('--clips', type=str, default="clips",
+                        help='Path where clips should be extracted')
+    parser.add_argument("--packed", action="store_true",
+                        help=f"Write all clips to one {PACKED_AUDIO} archive with a {PACKED_INDEX} index instead of one wav per clip")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of episodes processed in parallel (default: all cores)")
+    parser.add_argument("--progress", action="store_true",
+                        help="Show progress")
 
-    clip = audio[starts[i]:stops[i]]
-    wavfile.write(clip_path, sample_rate, clip)
+    args = parser.parse_args()
+    data = pd.read_csv(args.labels, dtype={"EpId": str})
+    extract_clips(data, args.wavs, args.clips, args.packed, args.workers, args.progress)
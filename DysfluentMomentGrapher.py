@@ -6,19 +6,25 @@ def plot_ML_fluency_chart(csv_path):
     df = pd.read_csv(csv_path)
     
     chunk_duration = 3
-    df['Start'] = df.index * chunk_duration
+    if 'Start' in df.columns:
+        # Overlapping windows: each window colours the stretch up to where the next one starts
+        df['Width'] = (df['Start'].shift(-1).fillna(df['End'].iloc[-1]) - df['Start']).clip(upper=chunk_duration)
+        total_duration = df['End'].max()
+    else:
+        df['Start'] = df.index * chunk_duration
+        df['Width'] = chunk_duration
+        total_duration = len(df) * chunk_duration
     
     fig, ax = plt.subplots(figsize=(10, 1))
     
     for _, row in df.iterrows():
         color = 'green' if row['Prediction'] == 1 else 'red'
-        ax.broken_barh([(row['Start'], chunk_duration)], (0, 1), facecolors=color)
+        ax.broken_barh([(row['Start'], row['Width'])], (0, 1), facecolors=color)
     
     ax.set_title('Audio Fluency Chart')
     ax.set_yticks([])
     ax.set_xlabel('Time (seconds)')
     
-    total_duration = len(df) * chunk_duration
     ax.set_xlim(0, total_duration)
     
     ax.spines['top'].set_visible(False)
@@ -0,0 +1,115 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+import numpy as np
+import pandas as pd
+import librosa
+from scipy.signal import resample_poly
+from tqdm import tqdm
+import feature_extractor as fe
+from audio_conditioning import normalize_rms
+from clip_dataset import ClipDataset
+from dataset_preparation import SPEED_FACTORS, PITCH_SHIFTS
+
+DEFAULT_AUGMENTATIONS = ('original',) + tuple(f"speed_{factor}" for factor in SPEED_FACTORS) + tuple(f"pitch_{steps}" for steps in PITCH_SHIFTS)
+
+def speed_perturb(y, factor):
+    """Plays a signal factor times faster by resampling, changing tempo and pitch together like sox's speed effect."""
+    ratio = Fraction(factor).limit_denominator(100)
+    return resample_poly(y, ratio.denominator, ratio.numerator).astype(np.float32)
+
+def pitch_shift(y, sr, n_steps):
+    """Shifts the pitch by n_steps semitones without changing the duration."""
+    return librosa.effects.pitch_shift(y, sr=sr, n_steps=n_steps)
+
+def apply_augmentation(y, sr, augmentation, rms_target=None):
+    """Applies one augmentation by name ('original', 'speed_<factor>' or 'pitch_<semitones>'), then optional RMS normalization."""
+    kind, _, value = augmentation.partition('_')
+    if kind == 'speed':
+        y = speed_perturb(y, float(value))
+    elif kind == 'pitch':
+        y = pitch_shift(y, sr, float(value))
+    elif kind != 'original':
+        raise ValueError(f"Unknown augmentation: {augmentation}")
+    return normalize_rms(y, rms_target) if rms_target is not None else y
+
+def augmentation_plan(n_clips, augmentations=DEFAULT_AUGMENTATIONS, per_clip=None, seed=0):
+    """Returns a DataFrame of (Row, Augmentation) pairs to extract.
+
+    By default every clip gets every augmentation, like the pre-materialized folders. With per_clip, each clip gets
+    that many augmentations drawn without replacement from a generator seeded by (seed, row), so the plan does not
+    depend on the number of workers or the order clips are processed in.
+    """
+    rows, names = [], []
+    for row in range(n_clips):
+        chosen = augmentations
+        if per_clip is not None:
+            rng = np.random.default_rng([seed, row])
+            chosen = [augmentations[i] for i in sorted(rng.choice(len(augmentations), per_clip, replace=False))]
+        rows.extend([row] * len(chosen))
+        names.extend(chosen)
+    return pd.DataFrame({'Row': rows, 'Augmentation': names})
+
+# ClipDataset opened once per worker process, keyed by its root
+_worker_datasets = {}
+
+def _load_clip(clip):
+    if isinstance(clip, tuple):
+        root, row = clip
+        if root not in _worker_datasets:
+            _worker_datasets[root] = ClipDataset(root)
+        dataset = _worker_datasets[root]
+        return dataset[row], dataset.sr
+    return librosa.load(clip, sr=None)
+
+def _augmented_clip_features(clip, augmentations, method, rms_target, kwargs):
+    """Worker: loads one clip once and returns the features of each of its augmentations."""
+    y, sr = _load_clip(clip)
+    return fe._extract_signal_batch([apply_augmentation(y, sr, augmentation, rms_target) for augmentation in augmentations],
+                                    sr, method, **kwargs)
+
+def extract_augmented_features(clips, augmentations=DEFAULT_AUGMENTATIONS, method='advanced', rms_target=None, per_clip=None,
+                               seed=0, n_workers=None, chunksize=4, progress=True, **kwargs):
+    """Extracts features of augmented clips in parallel workers without writing any augmented audio.
+
+    clips is a list of audio file paths or a clip_dataset.ClipDataset. Returns the float32 feature matrix and the
+    augmentation plan it follows; labels for the rows are labels[plan['Row']].
+    """
+    plan = augmentation_plan(len(clips), augmentations, per_clip, seed)
+    grouped = plan.groupby('Row', sort=True)['Augmentation'].apply(list)
+    sources = [(clips.root, row) for row in grouped.index] if isinstance(clips, ClipDataset) else [clips[row] for row in grouped.index]
+
+    feature_batches = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = executor.map(_augmented_clip_features, sources, grouped.values, [method] * len(sources),
+                               [rms_target] * len(sources), [kwargs] * len(sources), chunksize=chunksize)
+        for features in tqdm(results, total=len(sources), desc="Extracting augmented features", disable=not progress):
+            feature_batches.append(features)
+
+    # Worker results are grouped by clip, which is the order the plan is already in
+    features = np.concatenate(feature_batches, axis=0) if feature_batches else np.empty((0, 0), dtype=np.float32)
+    return features, plan
+
+def setup_arguments():
+    """Sets up command-line arguments for the script."""
+    parser = argparse.ArgumentParser(description="Extract features of augmented clips without writing augmented audio.")
+    parser.add_argument("clips", help="CSV file with a ClipPath column, or a packed clip dataset directory.")
+    parser.add_argument("output_path", help="Where to save the feature matrix (.npy); the plan is saved next to it as CSV.")
+    parser.add_argument("--augmentations", nargs='+', default=list(DEFAULT_AUGMENTATIONS),
+                        help="Augmentations to apply: original, speed_<factor>, pitch_<semitones>.")
+    parser.add_argument("--per-clip", type=int, default=None, help="Draw this many augmentations per clip instead of all of them.")
+    parser.add_argument("--rms-target", type=float, default=None, help="RMS normalize every augmented clip to this level (e.g. 0.05).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for drawing augmentations with --per-clip.")
+    parser.add_argument("--method", default='advanced', choices=list(fe.FEATURE_SETS), help="Feature extraction method.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores).")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = setup_arguments()
+    clips = ClipDataset(args.clips) if os.path.isdir(args.clips) else list(pd.read_csv(args.clips)['ClipPath'])
+    features, plan = extract_augmented_features(clips, args.augmentations, args.method, args.rms_target, args.per_clip,
+                                                args.seed, args.workers)
+    np.save(args.output_path, features)
+    plan.to_csv(os.path.splitext(args.output_path)[0] + "_plan.csv", index=False)
+    print(f"Saved {features.shape} features to {args.output_path}")
@@ -0,0 +1,65 @@
+import argparse
+import numpy as np
+import pandas as pd
+import soundfile as sf
+from tqdm import tqdm
+
+DEFAULT_TARGET_RMS = 0.05
+
+def signal_rms(y):
+    """Returns the RMS of a signal, or of each row of a stacked (n_signals, n_samples) array."""
+    y = np.asarray(y, dtype=np.float64)
+    return np.sqrt(np.mean(np.square(y), axis=-1))
+
+def normalize_rms(y, target_rms=DEFAULT_TARGET_RMS):
+    """Scales a signal, or each row of a stacked array, to the target RMS and clips to [-1, 1].
+
+    Silent signals are returned unchanged.
+    """
+    rms = signal_rms(y)
+    gain = np.divide(target_rms, rms, out=np.ones_like(rms), where=rms > 0)
+    return np.clip(y * np.expand_dims(gain, -1).astype(np.float32), -1.0, 1.0).astype(np.float32)
+
+def analyze_file(audio_path, blocksize=1 << 16):
+    """Returns the RMS, peak and duration of an audio file in one streaming pass at its native sample rate.
+
+    Channels are averaged first, like librosa.load, and only one block is held in memory at a time.
+    """
+    info = sf.info(audio_path)
+    sum_squares, peak, n_samples = 0.0, 0.0, 0
+    for block in sf.blocks(audio_path, blocksize=blocksize, dtype='float32', always_2d=True):
+        y = np.mean(block, axis=1, dtype=np.float64)
+        sum_squares += np.dot(y, y)
+        peak = max(peak, np.max(np.abs(y), initial=0.0))
+        n_samples += len(y)
+    return {'RMS': np.sqrt(sum_squares / n_samples) if n_samples else 0.0, 'Peak': peak, 'Seconds': n_samples / info.samplerate}
+
+def analyze_files(audio_paths, progress=True):
+    """Returns a DataFrame with the RMS, peak and duration of every file, in input order."""
+    return pd.DataFrame([analyze_file(audio_path) for audio_path in tqdm(audio_paths, desc="Analyzing loudness", disable=not progress)])
+
+def analyze_packed_dataset(dataset, batch_size=256, progress=True):
+    """Returns a DataFrame with the RMS, peak and duration of every clip of a clip_dataset.ClipDataset.
+
+    Clips are read batch by batch from the memory map, so the dataset is never held in memory.
+    """
+    rows = []
+    for _, signals in tqdm(dataset.iter_batches(batch_size), total=-(-len(dataset) // batch_size),
+                           desc="Analyzing loudness", disable=not progress):
+        for y in signals:
+            rows.append({'RMS': signal_rms(y), 'Peak': np.max(np.abs(y), initial=0.0), 'Seconds': len(y) / dataset.sr})
+    return pd.DataFrame(rows)
+
+def setup_arguments():
+    """Sets up command-line arguments for the script."""
+    parser = argparse.ArgumentParser(description="Measure the loudness of every clip listed in a CSV file.")
+    parser.add_argument("clips_csv", help="CSV file with a ClipPath column.")
+    parser.add_argument("output_csv", help="Where to save the CSV with RMS, Peak and Seconds columns added.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = setup_arguments()
+    clips_df = pd.read_csv(args.clips_csv)
+    loudness_df = analyze_files(clips_df['ClipPath'])
+    pd.concat([clips_df, loudness_df], axis=1).to_csv(args.output_csv, index=False)
+    print(loudness_df.describe())
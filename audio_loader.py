@@ -0,0 +1,140 @@
+from math import gcd
+import numpy as np
+import soundfile as sf
+import audioread
+import librosa
+from scipy.signal import resample_poly
+
+TARGET_SR = 16000
+
+def read_audio_info(audio_path):
+    """Returns (sample rate, channels) read from the file header without decoding any audio.
+
+    soundfile handles WAV, FLAC, OGG and (with libsndfile >= 1.1) MP3; other formats such as M4A fall back to
+    audioread, which also only opens the stream.
+    """
+    try:
+        info = sf.info(audio_path)
+        return info.samplerate, info.channels
+    except sf.LibsndfileError:
+        with audioread.audio_open(audio_path) as audio:
+            return audio.samplerate, audio.channels
+
+def read_audio_length(audio_path):
+    """Returns (frames, sample rate) read from the file header, falling back to audioread like read_audio_info.
+
+    audioread only reports a duration, so for those formats the frame count is rounded from it.
+    """
+    try:
+        info = sf.info(audio_path)
+        return info.frames, info.samplerate
+    except sf.LibsndfileError:
+        with audioread.audio_open(audio_path) as audio:
+            return int(round(audio.duration * audio.samplerate)), audio.samplerate
+
+def is_audio_in_target_format(audio_path, target_sr=TARGET_SR, target_channels=1):
+    """Checks if the audio file is already in the target sample rate and channel configuration."""
+    sr, channels = read_audio_info(audio_path)
+    return sr == target_sr and channels == target_channels
+
+def resample(y, orig_sr, target_sr=TARGET_SR):
+    """Resamples a signal with a polyphase filter."""
+    if orig_sr == target_sr:
+        return y
+    divisor = gcd(int(orig_sr), int(target_sr))
+    return resample_poly(y, target_sr // divisor, orig_sr // divisor, axis=-1).astype(np.float32)
+
+def load_audio(audio_path, target_sr=TARGET_SR):
+    """Decodes an audio file to a mono float32 signal at target_sr, entirely in memory.
+
+    The source file is only ever read. Channels are averaged the same way librosa.load downmixes, so 16 kHz mono
+    files load exactly as before.
+    """
+    try:
+        y, sr = sf.read(audio_path, dtype='float32', always_2d=True)
+        y = np.mean(y, axis=1)
+    except sf.LibsndfileError:
+        y, sr = librosa.load(audio_path, sr=None, mono=True)
+    return resample(y, sr, target_sr), target_sr
+
+def resample_blocks(blocks, orig_sr, target_sr=TARGET_SR):
+    """Resamples an iterable of consecutive mono signal blocks, yielding the output as soon as it is final.
+
+    Each piece is resampled with resample_poly together with enough neighbouring input to cover the filter, so
+    the concatenated output matches resample() of the whole signal exactly. Up to about 10 * max(up, down) / up
+    input samples (a couple of milliseconds) are held back until the next block or the end of the input arrives.
+    """
+    if orig_sr == target_sr:
+        yield from blocks
+        return
+
+    divisor = gcd(int(orig_sr), int(target_sr))
+    up, down = target_sr // divisor, orig_sr // divisor
+    # Input samples on either side of an output sample that resample_poly's filter can reach
+    margin = 10 * max(up, down) // up + 2
+
+    buffer, buffer_start, next_output = np.empty(0, dtype=np.float32), 0, 0  # buffer_start stays a multiple of down
+    blocks = iter(blocks)
+    finished = False
+    while not finished:
+        block = next(blocks, None)
+        finished = block is None
+        if not finished:
+            buffer = np.concatenate([buffer, block])
+        buffer_end = buffer_start + len(buffer)
+
+        # Outputs whose filter support lies entirely inside the buffer (or past the end of the signal)
+        last_output = -(-buffer_end * up // down) if finished else max(0, (buffer_end - margin) * up // down)
+        if last_output > next_output:
+            output_start = buffer_start * up // down
+            yield resample_poly(buffer, up, down).astype(np.float32)[next_output - output_start:last_output - output_start]
+            next_output = last_output
+        keep_from = max(0, (next_output * down // up - margin) // down * down)
+        if keep_from > buffer_start:
+            buffer, buffer_start = buffer[keep_from - buffer_start:], keep_from
+
+def _audioread_blocks(audio):
+    """Yields mono float32 blocks from an open audioread file, scaled and downmixed the way librosa.load does."""
+    frame_bytes = 2 * audio.channels
+    pending = b''
+    for buffer in audio:
+        pending += buffer
+        usable = len(pending) - len(pending) % frame_bytes
+        samples = np.frombuffer(pending[:usable], dtype='<i2').reshape(-1, audio.channels)
+        pending = pending[usable:]
+        if len(samples):
+            yield np.mean(samples / np.float32(32768), axis=1, dtype=np.float32)
+
+def _closing_blocks(audio):
+    with audio:
+        yield from _audioread_blocks(audio)
+
+def open_mono_blocks(audio_path, read_size=1 << 16):
+    """Returns (sample rate, iterator of mono float32 blocks) decoding the file a block at a time.
+
+    soundfile reads read_size frames per block; formats it cannot open, such as M4A, are decoded through
+    audioread in the buffers the decoder produces. Either way only a block is in memory at a time.
+    """
+    try:
+        sr = sf.info(audio_path).samplerate
+    except sf.LibsndfileError:
+        audio = audioread.audio_open(audio_path)
+        return audio.samplerate, _closing_blocks(audio)
+    # Downmix the same way load_audio does
+    return sr, (np.mean(block, axis=1) for block in sf.blocks(audio_path, blocksize=read_size, dtype='float32', always_2d=True))
+
+def stream_audio(audio_path, blocksize, target_sr=TARGET_SR, read_size=1 << 16):
+    """Yields a file as consecutive mono float32 blocks of blocksize samples at target_sr; the last may be shorter.
+
+    The file is decoded block by block with open_mono_blocks and resampled with resample_blocks, so the samples
+    match load_audio while only a few blocks are held in memory.
+    """
+    sr, mono_blocks = open_mono_blocks(audio_path, read_size)
+    pending = np.empty(0, dtype=np.float32)
+    for block in resample_blocks(mono_blocks, sr, target_sr):
+        pending = np.concatenate([pending, block])
+        while len(pending) >= blocksize:
+            yield pending[:blocksize]
+            pending = pending[blocksize:]
+    if len(pending):
+        yield pending
@@ -0,0 +1,173 @@
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+import audio_loader
+import generate_fluency_score as gfs
+from model_registry import ModelRegistry
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.mp3')
+RESULT_COLUMNS = ["Model Name", "Audio Clip", "Fluency Score", "Chunks", "Audio Seconds"]
+
+# Models loaded once per worker process by init_worker
+_worker_models = {}
+
+def collect_audio_paths(source):
+    """Returns the audio files in a directory (recursively) or listed one per line in a manifest file."""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(str(path) for path in source.rglob('*') if path.suffix.lower() in AUDIO_EXTENSIONS)
+    with open(source, mode='r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip()]
+
+def init_worker(model_dirs):
+    """Loads every model and scaler once when a worker process starts.
+
+    Models are memory-mapped so the workers share the large forest arrays through the page cache.
+    """
+    registry = ModelRegistry(max_entries=2 * len(model_dirs), mmap_mode='r')
+    for model_dir in model_dirs:
+        model_name = os.path.basename(os.path.normpath(model_dir))
+        _worker_models[model_name] = registry.load_model_dir(model_dir)
+
+def score_file(audio_path, batch_size=64):
+    """Scores one audio file against every model loaded in this worker.
+
+    Features are extracted once per file and shared by all models since they all use the advanced feature set.
+    Audio at other sample rates or with several channels is converted to 16 kHz mono while it is streamed.
+    """
+    frames, orig_sr = audio_loader.read_audio_length(audio_path)
+    duration = frames / orig_sr
+    sr = audio_loader.TARGET_SR
+
+    feature_batches, batch = [], []
+    for chunk in gfs.stream_audio_chunks(audio_path):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            feature_batches.append(gfs.extract_chunk_features(batch, sr, batch_size))
+            batch = []
+    if batch:
+        feature_batches.append(gfs.extract_chunk_features(batch, sr, batch_size))
+
+    rows = []
+    for model_name, (model, scaler) in _worker_models.items():
+        if feature_batches:
+            predictions = model.predict(scaler.transform(np.concatenate(feature_batches, axis=0)))
+            fluency_score, n_chunks = np.mean(predictions), len(predictions)
+        else:
+            fluency_score, n_chunks = np.nan, 0
+        rows.append([model_name, audio_path, fluency_score, n_chunks, duration])
+    return audio_path, duration, rows
+
+def parquet_parts_dir(output_path):
+    """Directory holding the Parquet part files of a run until they are merged into output_path."""
+    return Path(f"{output_path}.parts")
+
+def read_results(output_path):
+    """Reads a results file, together with the Parquet parts an interrupted run left next to it."""
+    if not output_path.endswith('.parquet'):
+        return pd.read_csv(output_path) if os.path.exists(output_path) else pd.DataFrame(columns=RESULT_COLUMNS)
+    frames = [pd.read_parquet(output_path)] if os.path.exists(output_path) else []
+    frames += [pd.read_parquet(part) for part in sorted(parquet_parts_dir(output_path).glob('part-*.parquet'))]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=RESULT_COLUMNS)
+
+def load_completed(output_path, model_names):
+    """Returns the existing result rows and the set of audio files already scored by every requested model."""
+    results_df = read_results(output_path)
+    if results_df.empty:
+        return results_df, set()
+    scored = results_df[results_df["Model Name"].isin(model_names)].groupby("Audio Clip")["Model Name"].nunique()
+    return results_df, set(scored[scored == len(model_names)].index)
+
+def batch_score(audio_paths, model_dirs, output_path, n_workers=None, resume=False, batch_size=64, parquet_part_files=32):
+    """Scores audio files against several models on a process pool and writes one combined results file.
+
+    Results are saved as they arrive so an interrupted run can be resumed: CSV output is appended to after every
+    file, and Parquet rows are written every parquet_part_files files to part files in output_path + '.parts',
+    which are merged into output_path at the end.
+    """
+    model_names = [os.path.basename(os.path.normpath(model_dir)) for model_dir in model_dirs]
+    is_parquet = output_path.endswith('.parquet')
+    parts_dir = parquet_parts_dir(output_path)
+
+    _, completed = load_completed(output_path, model_names) if resume else (None, set())
+    pending_paths = [path for path in audio_paths if path not in completed]
+    if completed:
+        print(f"Resuming: skipping {len(audio_paths) - len(pending_paths)} already scored files")
+
+    if not is_parquet and not (resume and os.path.exists(output_path)):
+        pd.DataFrame(columns=RESULT_COLUMNS).to_csv(output_path, index=False)
+    if is_parquet:
+        if not resume:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+        parts_dir.mkdir(parents=True, exist_ok=True)
+    part_index = len(list(parts_dir.glob('part-*.parquet'))) if is_parquet else 0
+
+    def write_part(rows):
+        nonlocal part_index
+        # Written under a temporary name so a part file is never half there
+        temp_path = parts_dir / f"part-{part_index:06d}.tmp"
+        pd.DataFrame(rows, columns=RESULT_COLUMNS).to_parquet(temp_path, index=False)
+        os.replace(temp_path, parts_dir / f"part-{part_index:06d}.parquet")
+        part_index += 1
+
+    new_rows, new_files = [], 0
+    audio_seconds = 0.0
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker, initargs=(model_dirs,)) as executor:
+        futures = {executor.submit(score_file, path, batch_size): path for path in pending_paths}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Scoring files"):
+            try:
+                _, duration, rows = future.result()
+            except Exception as e:
+                print(f"Failed to score {futures[future]}: {e}")
+                continue
+            audio_seconds += duration
+            if is_parquet:
+                new_rows.extend(rows)
+                new_files += 1
+                if new_files % parquet_part_files == 0:
+                    write_part(new_rows)
+                    new_rows = []
+            else:
+                pd.DataFrame(rows, columns=RESULT_COLUMNS).to_csv(output_path, mode='a', header=False, index=False)
+
+    if is_parquet:
+        if new_rows:
+            write_part(new_rows)
+        # When resuming, the merged file keeps the rows of earlier runs; otherwise it is replaced
+        frames = [pd.read_parquet(part) for part in sorted(parts_dir.glob('part-*.parquet'))]
+        if resume and os.path.exists(output_path):
+            frames.insert(0, pd.read_parquet(output_path))
+        results_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=RESULT_COLUMNS)
+        temp_path = f"{output_path}.tmp"
+        results_df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, output_path)
+        shutil.rmtree(parts_dir)
+
+    elapsed = time.perf_counter() - start_time
+    throughput = audio_seconds / elapsed if elapsed > 0 else 0.0
+    print(f"Scored {audio_seconds:.1f} audio-seconds in {elapsed:.1f} s ({throughput:.1f} audio-seconds per wall-second)")
+    return throughput
+
+def setup_arguments():
+    """Sets up command-line arguments for the script."""
+    parser = argparse.ArgumentParser(description="Score many audio files against several models in parallel.")
+    parser.add_argument("audio_source", help="Directory of audio files, or a manifest file with one audio path per line.")
+    parser.add_argument("output_path", help="Combined results file (.csv or .parquet).")
+    parser.add_argument("--models", nargs='+', required=True,
+                        help="Model directories, each containing model.joblib and scaler.joblib.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores).")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per feature extraction batch.")
+    parser.add_argument("--resume", action="store_true", help="Skip files already present in the output file.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = setup_arguments()
+    batch_score(collect_audio_paths(args.audio_source), args.models, args.output_path,
+                n_workers=args.workers, resume=args.resume, batch_size=args.batch_size)
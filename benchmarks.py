@@ -0,0 +1,244 @@
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import librosa
+import feature_extractor as fe
+import dataset_preparation as dp
+
+def synthetic_speech_like(n_signals, sr=16000, duration=3, seed=0):
+    """Generates harmonic signals with a wandering f0 plus noise, a rough stand-in for voiced speech."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * duration)) / sr
+    signals = []
+    for _ in range(n_signals):
+        f0 = rng.uniform(90, 260) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.2, 2) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sr
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+        signals.append(0.1 * voiced + 0.02 * rng.standard_normal(len(t)))
+    return np.stack(signals).astype(np.float32)
+
+def measure(function, repeats=3):
+    """Returns (best wall time in seconds, peak traced memory in MB) of calling function()."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 2**20
+
+def benchmark_pitch_backends(n_chunks=64, sr=16000, repeats=3):
+    """Compares the piptrack and YIN pitch backends of the advanced feature extractor on 3-second chunks."""
+    signals = synthetic_speech_like(n_chunks, sr)
+    print(f"Advanced features for {n_chunks} x 3 s chunks")
+    for backend in fe.PITCH_BACKENDS:
+        pitch_time, pitch_memory = measure(lambda: fe._pitch_features(signals, sr, int(sr * 0.025), int(sr * 0.01), backend), repeats)
+        total_time, total_memory = measure(lambda: fe.extract_features_advanced_batch(signals, sr, pitch_backend=backend), repeats)
+        print(f"  {backend:>8}: pitch {pitch_time * 1000:8.1f} ms, {pitch_memory:7.1f} MB peak | "
+              f"all features {total_time * 1000:8.1f} ms, {total_memory:7.1f} MB peak")
+
+def benchmark_shared_stft(n_chunks=64, sr=16000, repeats=3):
+    """Compares computing the basic and advanced feature sets with separate STFTs against one shared pass."""
+    signals = synthetic_speech_like(n_chunks, sr)
+    n_fft, hop_length = fe.advanced_frame_parameters(sr)
+
+    def separate_stfts():
+        # One STFT each for the MFCCs, the mel energies and piptrack, as the extractors used to do
+        librosa.feature.mfcc(y=signals, sr=sr, n_mfcc=fe.N_MFCC)
+        librosa.feature.melspectrogram(y=signals, sr=sr, n_fft=n_fft, hop_length=hop_length, n_mels=40, fmax=8000)
+        librosa.piptrack(y=signals, sr=sr, n_fft=n_fft, hop_length=hop_length)
+
+    print(f"Basic + advanced features for {n_chunks} x 3 s chunks")
+    for name, function in [('separate STFTs', separate_stfts),
+                           ('two STFTs (default)', lambda: fe.extract_feature_sets(signals, sr)),
+                           ('share_stft=True', lambda: fe.extract_feature_sets(signals, sr, share_stft=True))]:
+        elapsed, memory = measure(function, repeats)
+        print(f"  {name:>20}: {elapsed * 1000:8.1f} ms, {memory:7.1f} MB peak")
+
+def benchmark_window_aggregation(minutes=10, hop_seconds=0.5, repeats=3):
+    """Compares re-reducing every window against prefix-sum window means over a long frame matrix."""
+    rng = np.random.default_rng(0)
+    frame_hop, window_frames, n_values = 0.01, 301, 442
+    frames = rng.random((int(minutes * 60 / frame_hop), n_values), dtype=np.float32)
+    starts = np.arange(0, len(frames) - window_frames + 1, int(hop_seconds / frame_hop))
+
+    print(f"Window means for {len(starts)} x 3 s windows ({hop_seconds} s hop) over {minutes} min of frames")
+    for name, function in [('per-window mean', lambda: np.stack([frames[start:start + window_frames].mean(axis=0) for start in starts])),
+                           ('prefix sums', lambda: fe.aggregate_frames(frames, starts, window_frames, axis=0))]:
+        elapsed, memory = measure(function, repeats)
+        print(f"  {name:>16}: {elapsed * 1000:8.1f} ms, {memory:7.1f} MB peak")
+
+def synthetic_label_table(n_rows=28000, seed=0):
+    """Generates a SEP-28k-like label table with random annotation counts."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'Show': rng.choice(['HeStutters', 'MyStuttering', 'StutterTalk', 'WomenWhoStutter'], n_rows),
+                       'EpId': rng.integers(0, 200, n_rows), 'ClipId': np.arange(n_rows)})
+    for column in dp.LABEL_COLUMNS + dp.QUALITY_COLUMNS:
+        df[column] = rng.choice(4, n_rows, p=[0.7, 0.2, 0.07, 0.03])
+    return df
+
+def _apply_fluency_label(df, columns, threshold):
+    # The row-wise version the notebooks used
+    fluency_label = df[columns].apply(lambda x: (x == 2).any() or (x == 3).any() or x.mean() > threshold, axis=1).astype(int)
+    df['Fluency Label'] = 1 - fluency_label
+    return df
+
+def _apply_clip_paths(df, base_path):
+    def path_for_row(row):
+        folder = Path(base_path) / row['Show'] / str(int(row['EpId']))
+        filename = f"{row['Show']}_{int(row['EpId'])}_{int(row['ClipId'])}.wav"
+        return str(folder / filename)
+
+    df['ClipPath'] = df.apply(path_for_row, axis=1)
+    return df
+
+def benchmark_dataset_preparation(n_rows=28000, repeats=3):
+    """Compares the row-wise apply label and path generation against the vectorized dataset_preparation versions."""
+    df = synthetic_label_table(n_rows)
+    base_path = Path("AudioFiles") / "clips"
+    print(f"Dataset preparation for {n_rows} label rows")
+    for name, reference, vectorized in [
+            ('fluency label', lambda: _apply_fluency_label(df.copy(), dp.LABEL_COLUMNS, dp.STRICT_THRESHOLD),
+             lambda: dp.compute_fluency_label(df.copy(), dp.LABEL_COLUMNS, dp.STRICT_THRESHOLD)),
+            ('clip paths', lambda: _apply_clip_paths(df.copy(), base_path), lambda: dp.generate_clip_paths(df.copy(), base_path))]:
+        matches = reference().equals(vectorized())
+        apply_time, _ = measure(reference, repeats)
+        vectorized_time, _ = measure(vectorized, repeats)
+        print(f"  {name:>14}: apply {apply_time * 1000:8.1f} ms | vectorized {vectorized_time * 1000:7.1f} ms "
+              f"({apply_time / vectorized_time:5.1f}x, identical: {matches})")
+
+def benchmark_compiled_model(n_trees=100, n_rows=2000, repeats=3):
+    """Compares loading and predicting with a joblib random forest against its compiled NumPy version."""
+    import joblib
+    import tempfile
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    import compiled_model as cm
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(5000, 40)).astype(np.float32)
+    labels = (features[:, 0] + features[:, 1] + rng.normal(size=len(features)) > 0).astype(int)
+    scaler = StandardScaler().fit(features)
+    model = RandomForestClassifier(n_estimators=n_trees, random_state=0).fit(scaler.transform(features), labels)
+    queries = rng.normal(size=(n_rows, 40)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        joblib_path, compiled_path = Path(directory) / "model.joblib", Path(directory) / "model.npz"
+        joblib.dump(model, joblib_path)
+        cm.save_compiled_model(cm.compile_model(model, scaler), compiled_path)
+        compiled = cm.load_compiled_model(compiled_path)
+        matches = np.array_equal(model.predict(scaler.transform(queries)), compiled.predict(queries))
+        print(f"Random forest with {n_trees} trees, {n_rows} rows (identical predictions: {matches})")
+        for name, load, predict in [
+                ('joblib', lambda: joblib.load(joblib_path), lambda: model.predict(scaler.transform(queries))),
+                ('compiled', lambda: cm.load_compiled_model(compiled_path), lambda: compiled.predict(queries))]:
+            load_time, _ = measure(load, repeats)
+            predict_time, _ = measure(predict, repeats)
+            single_time, _ = measure(lambda: compiled.predict(queries[:1]) if name == 'compiled' else model.predict(scaler.transform(queries[:1])), repeats)
+            print(f"  {name:>8}: load {load_time * 1000:7.1f} ms | predict {predict_time * 1000:7.1f} ms | "
+                  f"single row {single_time * 1000:6.2f} ms")
+
+def benchmark_multi_label_training(n_rows=4000, n_candidates=6, cv=3):
+    """Times the multi-label LightGBM search under a shared core budget for increasing core counts. At each core
+    count it is compared with the same halving candidates and rounds fitting MultiOutputClassifier(LGBMClassifier),
+    which bins the features again for every fit; the nested RandomizedSearchCV with n_jobs=-1 at every level is
+    timed once for reference."""
+    import lightgbm as lgb
+    from joblib import Parallel, delayed
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import ParameterSampler, RandomizedSearchCV
+    from sklearn.multioutput import MultiOutputClassifier
+    import model_trainer as mt
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(n_rows, 40)).astype(np.float32)
+    labels = (features[:, :5] + rng.normal(size=(n_rows, 5)) > 0.5).astype(int)
+    param_grid = {'num_leaves': [15, 31, 63], 'learning_rate': [0.05, 0.1], 'colsample_bytree': [0.5, 0.9]}
+    base_params = {'objective': 'binary', 'random_state': 42, 'n_estimators': 100, 'verbose': -1}
+    available = mt.available_cores()
+    print(f"Multi-label LightGBM search, {n_candidates} candidates x {cv} folds x 5 labels on {n_rows} rows "
+          f"({available} cores available)")
+
+    nested = RandomizedSearchCV(MultiOutputClassifier(lgb.LGBMClassifier(**base_params, n_jobs=-1), n_jobs=-1),
+                                {f"estimator__{key}": value for key, value in param_grid.items()}, n_iter=n_candidates,
+                                cv=cv, scoring='accuracy', n_jobs=-1, random_state=42)
+    # Timed once: each search takes seconds, and measure() would run it again under tracemalloc
+    start = time.perf_counter()
+    nested.fit(features, labels)
+    nested_time = time.perf_counter() - start
+    print(f"  nested n_jobs=-1, no halving: {nested_time:6.1f} s")
+
+    def fit_and_score(params, train, test, threads):
+        model = MultiOutputClassifier(lgb.LGBMClassifier(**base_params, **params, n_jobs=threads))
+        model.fit(features[train], labels[train])
+        return accuracy_score(labels[test], model.predict(features[test]))
+
+    def halving_baseline(n_cores):
+        n_workers, threads = mt.split_thread_budget(n_candidates * cv, 'cpu', n_cores)
+
+        def score_round(candidates, rows, splits):
+            scores = parallel(delayed(fit_and_score)(params, rows[train], rows[test], threads)
+                              for params in candidates for train, test in splits)
+            return np.asarray(scores).reshape(len(candidates), cv).mean(axis=1)
+
+        with Parallel(n_jobs=n_workers, prefer='threads') as parallel:
+            mt._successive_halving(list(ParameterSampler(param_grid, n_candidates, random_state=42)), n_rows, cv, 3,
+                                   score_round, verbose=0)
+
+    core_counts = sorted({1, available} | {2 ** k for k in range(1, 8) if 2 ** k < available})
+    for n_cores in core_counts:
+        start = time.perf_counter()
+        halving_baseline(n_cores)
+        baseline_time = time.perf_counter() - start
+        start = time.perf_counter()
+        mt.multi_label_lightgbm_search(features, labels, base_params, param_grid, n_candidates, cv, accuracy_score, 'cpu',
+                                       n_cores, verbose=0)
+        search_time = time.perf_counter() - start
+        print(f"  {n_cores:3d} cores: MultiOutputClassifier halving {baseline_time:6.1f} s | "
+              f"shared binned data {search_time:6.1f} s | speedup {baseline_time / search_time:4.2f}x")
+
+def benchmark_multi_label_models(n_rows=6000, n_test=2000):
+    """Compares five per-label LightGBM boosters against one multi-output random forest: fit time, per-chunk
+    prediction time and accuracy on synthetic labels."""
+    import lightgbm as lgb
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.multioutput import MultiOutputClassifier
+    import model_trainer as mt
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(n_rows + n_test, 40)).astype(np.float32)
+    labels = (features[:, :5] + 0.5 * features[:, 5:10] * features[:, 10:15] + rng.normal(size=(n_rows + n_test, 5)) > 1).astype(int)
+    print(f"Multi-label models on {n_rows} training and {n_test} test rows")
+    for name, model in [
+            ('per-label LightGBM', MultiOutputClassifier(lgb.LGBMClassifier(random_state=42, verbose=-1))),
+            ('multi-output forest', RandomForestClassifier(n_estimators=30, max_depth=10, min_samples_leaf=10, max_features=0.7,
+                                                           max_samples=0.2, random_state=42, n_jobs=-1))]:
+        start = time.perf_counter()
+        model.fit(features[:n_rows], labels[:n_rows])
+        mt.report_multi_label_model(f"  {name}", model, features[n_rows:], labels[n_rows:], time.perf_counter() - start)
+
+BENCHMARKS = {
+    'pitch': benchmark_pitch_backends,
+    'stft': benchmark_shared_stft,
+    'windows': benchmark_window_aggregation,
+    'dataset': benchmark_dataset_preparation,
+    'compiled': benchmark_compiled_model,
+    'training': benchmark_multi_label_training,
+    'multilabel': benchmark_multi_label_models,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run performance benchmarks.")
+    parser.add_argument("benchmarks", nargs='*', help=f"Benchmarks to run, any of {list(BENCHMARKS)} (default: all).")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {sorted(unknown)}")
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,85 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import soundfile as sf
+from tqdm import tqdm
+
+# Same layout as Data/extract_clips_updated.py --packed writes
+PACKED_AUDIO = "clips.npy"
+PACKED_INDEX = "clips_index.csv"
+
+def pack_clips(df, output_dir, path_column='ClipPath', dtype='int16', sr=16000, n_workers=8, progress=True):
+    """Packs the clip files listed in df into one contiguous array plus an index of their offsets, lengths and labels.
+
+    Every other column of df (labels, Show, EpId, ...) is kept in the index. int16 storage halves the size and is
+    lossless for 16-bit PCM clips; use float32 for clips saved in floating point, such as augmented copies.
+    """
+    df = df.reset_index(drop=True)
+    infos = [sf.info(path) for path in df[path_column]]
+    for path, info in zip(df[path_column], infos):
+        if info.samplerate != sr or info.channels != 1:
+            raise ValueError(f"{path} is {info.samplerate} Hz with {info.channels} channels, expected {sr} Hz mono")
+
+    lengths = np.array([info.frames for info in infos], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+    os.makedirs(output_dir, exist_ok=True)
+    audio = np.lib.format.open_memmap(os.path.join(output_dir, PACKED_AUDIO), mode='w+', dtype=dtype, shape=(int(lengths.sum()),))
+
+    def copy_clip(i):
+        audio[offsets[i]:offsets[i] + lengths[i]] = sf.read(df[path_column][i], dtype=dtype)[0]
+
+    # soundfile releases the GIL while decoding, so threads overlap file reads
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        list(tqdm(executor.map(copy_clip, range(len(df))), total=len(df), desc="Packing clips", disable=not progress))
+    audio.flush()
+
+    index = df.assign(Offset=offsets, Length=lengths)
+    index.to_csv(os.path.join(output_dir, PACKED_INDEX), index=False)
+    return index
+
+class ClipDataset:
+    """Random access to a packed clip dataset through a read-only memory map of its audio array.
+
+    Clips are returned as float32 signals scaled like librosa.load, so features match those of the original files.
+    float32 archives hand out zero-copy views of the map; int16 archives are converted clip by clip.
+    """
+
+    def __init__(self, root, sr=16000):
+        self.root = root
+        self.sr = sr
+        self.index = pd.read_csv(os.path.join(root, PACKED_INDEX), dtype={'EpId': str})
+        self.audio = np.load(os.path.join(root, PACKED_AUDIO), mmap_mode='r')
+        self._offsets = self.index['Offset'].to_numpy()
+        self._lengths = self.index['Length'].to_numpy()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        clip = self.audio[self._offsets[i]:self._offsets[i] + self._lengths[i]]
+        if clip.dtype == np.int16:
+            return clip / np.float32(32768)
+        return clip
+
+    def iter_batches(self, batch_size=64, rows=None):
+        """Yields (row positions, list of signals) for the given rows (default: all) in batches of batch_size."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            yield batch, [self[i] for i in batch]
+
+def setup_arguments():
+    """Sets up command-line arguments for the script."""
+    parser = argparse.ArgumentParser(description="Pack the clips listed in a CSV into one memory-mappable dataset.")
+    parser.add_argument("clips_csv", help="CSV file with a ClipPath column and any label columns to keep.")
+    parser.add_argument("output_dir", help=f"Directory to write {PACKED_AUDIO} and {PACKED_INDEX} to.")
+    parser.add_argument("--dtype", default='int16', choices=['int16', 'float32'], help="Sample storage type.")
+    parser.add_argument("--workers", type=int, default=8, help="Threads reading clip files.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = setup_arguments()
+    index = pack_clips(pd.read_csv(args.clips_csv), args.output_dir, dtype=args.dtype, n_workers=args.workers)
+    print(f"Packed {len(index)} clips ({index['Length'].sum() / 16000 / 3600:.1f} hours) into {args.output_dir}")
@@ -0,0 +1,356 @@
+import argparse
+import time
+import numpy as np
+
+COMPILED_FORMAT_VERSION = 1
+
+class IdentityScaler:
+    """Stands in for the scaler of a compiled model, whose thresholds already include the scaling."""
+
+    def transform(self, X):
+        return X
+
+IDENTITY_SCALER = IdentityScaler()
+
+def _float_keys(values, dtype):
+    """Maps floats to integers that sort in the same order, so the float line can be bisected."""
+    int_type = np.int32 if dtype == np.float32 else np.int64
+    bits = np.asarray(values, dtype=dtype).view(int_type).astype(np.int64)
+    return np.where(bits < 0, -(bits & np.iinfo(int_type).max), bits)
+
+def _keys_to_floats(keys, dtype):
+    int_type = np.int32 if dtype == np.float32 else np.int64
+    sign = np.int64(np.iinfo(int_type).min)
+    bits = np.where(keys < 0, (-keys) | sign, keys).astype(int_type)
+    return bits.view(dtype)
+
+def _scaled(x, mean, scale, dtype, split_dtype):
+    """Reproduces StandardScaler.transform for inputs of dtype, followed by the cast the model applies before splitting."""
+    with np.errstate(over='ignore'):
+        return _scaled_unchecked(x, mean, scale, dtype, split_dtype)
+
+def _scaled_unchecked(x, mean, scale, dtype, split_dtype):
+    if dtype == np.float32:
+        # In-place float32 arithmetic: each step is computed in float64 and rounded back to float32
+        x = (x.astype(np.float64) - mean).astype(np.float32)
+        x = (x.astype(np.float64) / scale).astype(np.float32)
+    else:
+        x = (x - mean) / scale
+    return x.astype(split_dtype).astype(np.float64)
+
+def _fused_thresholds(features, thresholds, mean, scale, dtype, split_dtype):
+    """Returns, per split, the largest input value of dtype that the scaled comparison sends left.
+
+    Scaling and rounding are monotonic, so 'scaled(x) <= threshold' holds exactly for x up to a boundary, found here
+    by bisecting the float line. Comparing raw inputs against these boundaries then reproduces the original
+    model bit for bit without transforming the features.
+    """
+    mean, scale = mean[features], scale[features]
+    limit = np.finfo(dtype).max
+    goes_left = lambda keys: _scaled(_keys_to_floats(keys, dtype), mean, scale, dtype, split_dtype) <= thresholds
+
+    low = np.full(len(features), _float_keys(-limit, dtype))
+    high = np.full(len(features), _float_keys(limit, dtype))
+    always_left, never_left = goes_left(high), ~goes_left(low)
+    while np.any(low + 1 < high):
+        # Halve each bound first: the float64 key range does not fit in an int64 difference
+        middle = (low >> 1) + (high >> 1) + (low & high & 1)
+        left = goes_left(middle)
+        low = np.where(left, middle, low)
+        high = np.where(left, high, middle)
+
+    boundaries = _keys_to_floats(low, dtype).astype(np.float64)
+    boundaries[always_left] = np.inf
+    boundaries[never_left] = -np.inf
+    return boundaries
+
+def _scaler_arrays(scaler, n_features):
+    mean, scale = np.zeros(n_features), np.ones(n_features)
+    if scaler is not None:
+        if type(scaler).__name__ != 'StandardScaler':
+            raise TypeError(f"Only StandardScaler can be fused, got {type(scaler).__name__}")
+        if scaler.with_mean:
+            mean = np.asarray(scaler.mean_, dtype=np.float64)
+        if scaler.with_std:
+            scale = np.asarray(scaler.scale_, dtype=np.float64)
+    return mean, scale
+
+def _flatten_sklearn_forest(forest):
+    """Collects the nodes of every tree of a fitted sklearn forest classifier."""
+    n_classes = np.atleast_1d(forest.n_classes_)
+    nodes = []
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        value = tree.value[:, :, :n_classes.max()].astype(np.float64)
+        # DecisionTreeClassifier.predict_proba normalizes each output's class distribution at the leaf
+        for output, n in enumerate(n_classes):
+            normalizer = value[:, output, :n].sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            value[:, output, :n] /= normalizer[:, np.newaxis]
+        is_leaf = tree.children_left < 0
+        missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)).astype(bool)
+        nodes.append((tree.feature, tree.threshold, tree.children_left, tree.children_right, is_leaf, missing_left,
+                      value.reshape(tree.node_count, -1)))
+    return nodes
+
+def _flatten_lightgbm(booster_dump):
+    """Collects the nodes of every tree of a LightGBM model dump (one tree per iteration for binary models)."""
+    nodes = []
+    for tree_info in booster_dump['tree_info']:
+        features, thresholds, lefts, rights, leaves, missing_left, values = [], [], [], [], [], [], []
+
+        def add(node):
+            index = len(features)
+            features.append(0); thresholds.append(np.inf); lefts.append(-1); rights.append(-1)
+            leaves.append('leaf_value' in node); missing_left.append(True); values.append([node.get('leaf_value', 0.0)])
+            if 'leaf_value' in node:
+                return index
+            if node['decision_type'] != '<=':
+                raise ValueError("Categorical splits are not supported")
+            if node['missing_type'] == 'Zero':
+                raise ValueError("Models trained with zero_as_missing are not supported")
+            features[index], thresholds[index] = node['split_feature'], node['threshold']
+            # NaN is the missing value itself, or is replaced by 0.0 before the comparison
+            missing_left[index] = node['default_left'] if node['missing_type'] == 'NaN' else 0.0 <= node['threshold']
+            lefts[index] = add(node['left_child'])
+            rights[index] = add(node['right_child'])
+            return index
+
+        add(tree_info['tree_structure'])
+        nodes.append((np.array(features), np.array(thresholds, dtype=np.float64), np.array(lefts), np.array(rights),
+                      np.array(leaves), np.array(missing_left), np.array(values, dtype=np.float64)))
+    return nodes
+
+class CompiledTreeModel:
+    """A tree ensemble flattened into NumPy node arrays, scored for a whole batch of rows at once.
+
+    kind is 'forest' (class probabilities averaged over trees, like sklearn's RandomForestClassifier) or 'gbdt'
+    (leaf values summed and passed through a sigmoid, like a binary LightGBM model). Trees are accumulated in their
+    original order, so predicted labels, forest probabilities and gbdt raw scores match the source model exactly;
+    gbdt probabilities can differ in the last bit of the sigmoid.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.kind = str(arrays['kind'])
+        self.n_features = int(arrays['n_features'])
+        self.classes_ = arrays['classes']
+        self.n_classes = arrays['n_classes']
+        self._roots = arrays['roots']
+        # Each tree's nodes are laid out level by level with siblings side by side, so a row's next node is
+        # _left[node] + went_right and the nodes a block of trees visits stay close together. Leaves loop back to
+        # themselves (threshold +inf sends every row left), so finished rows can keep stepping until enough of
+        # them are done to be worth dropping.
+        left, right, is_leaf = arrays['left'], arrays['right'], arrays['left'] < 0
+        levels, level = [], self._roots
+        while len(level):
+            levels.append(level)
+            branches = level[~is_leaf[level]]
+            level = np.stack((left[branches], right[branches]), axis=1).ravel()
+        tree_of = np.repeat(np.arange(len(self._roots)), np.diff(np.append(self._roots, len(left))))
+        breadth_first = np.concatenate(levels)
+        self._order = breadth_first[np.argsort(tree_of[breadth_first], kind='stable')]
+        position = np.empty(len(left), dtype=np.intp)
+        position[self._order] = np.arange(len(left))
+
+        own = np.arange(len(left), dtype=np.intp)
+        self._left = np.where(is_leaf[self._order], own, position[left[self._order]])
+        self._laid_out_roots = position[self._roots]
+        self._feature = arrays['feature'][self._order].astype(np.intp)
+        self._thresholds = {np.dtype(np.float32): arrays['threshold32'][self._order].astype(np.float32),
+                            np.dtype(np.float64): arrays['threshold64'][self._order]}
+        self._nan_right = ~arrays['nan_left'][self._order]
+        # One row per output value, so each tree's contribution is a single gather along the leaves
+        self._values = np.ascontiguousarray(arrays['values'][self._order].transpose())
+
+    @classmethod
+    def from_nodes(cls, kind, nodes, classes, n_classes, n_features, scaler, split_dtype, **extra):
+        mean, scale = _scaler_arrays(scaler, n_features)
+        roots, offset = [], 0
+        parts = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'nan_left', 'values')}
+        for feature, threshold, left, right, is_leaf, missing_left, values in nodes:
+            parts['feature'].append(np.where(is_leaf, 0, feature))
+            parts['threshold'].append(np.where(is_leaf, np.inf, threshold))
+            parts['left'].append(np.where(is_leaf, -1, left + offset))
+            parts['right'].append(np.where(is_leaf, -1, right + offset))
+            parts['nan_left'].append(np.where(is_leaf, True, missing_left))
+            parts['values'].append(values)
+            roots.append(offset)
+            offset += len(feature)
+
+        arrays = {name: np.concatenate(part) for name, part in parts.items()}
+        features, thresholds = arrays.pop('feature').astype(np.int32), arrays.pop('threshold')
+        arrays.update(
+            kind=np.array(kind), feature=features, roots=np.array(roots, dtype=np.int64),
+            left=arrays['left'].astype(np.int64), right=arrays['right'].astype(np.int64), nan_left=arrays['nan_left'].astype(bool),
+            threshold32=_fused_thresholds(features, thresholds, mean, scale, np.float32, split_dtype),
+            threshold64=_fused_thresholds(features, thresholds, mean, scale, np.float64, split_dtype),
+            classes=np.asarray(classes), n_classes=np.asarray(n_classes), n_features=np.array(n_features),
+            format_version=np.array(COMPILED_FORMAT_VERSION), **{key: np.asarray(value) for key, value in extra.items()})
+        return cls(arrays)
+
+    def apply(self, X):
+        """Returns the leaf node each row reaches in every tree, as an (n_rows, n_trees) array."""
+        return self._order[self._leaves(X)].transpose()
+
+    def _leaves(self, X, pairs_per_block=1 << 16):
+        """Returns the leaf each row reaches in every tree, as an (n_trees, n_rows) array of laid-out node positions.
+
+        Trees are walked a block at a time, all (row, tree) pairs of the block descending one level per step on
+        the input's own float32 or float64 values; pairs that reached a leaf are dropped once they are the
+        majority, so the work follows the actual path lengths rather than the deepest tree. Blocks of about
+        pairs_per_block pairs keep the working arrays in cache.
+        """
+        X = np.asarray(X)
+        if X.dtype not in self._thresholds:
+            X = X.astype(np.float64)
+        X = np.ascontiguousarray(X)
+        flat, thresholds = X.ravel(), self._thresholds[X.dtype]
+        has_nan = np.isnan(flat).any()
+        n_rows, n_trees = len(X), len(self._roots)
+        row_offsets = np.arange(n_rows, dtype=np.intp) * X.shape[1]
+
+        leaves = np.empty((n_trees, n_rows), dtype=np.intp)
+        trees_per_block = max(1, pairs_per_block // max(n_rows, 1))
+        for first_tree in range(0, n_trees, trees_per_block):
+            roots = self._laid_out_roots[first_tree:first_tree + trees_per_block]
+            block_leaves = leaves[first_tree:first_tree + len(roots)].reshape(-1)
+            nodes = np.repeat(roots, n_rows)
+            offsets = np.tile(row_offsets, len(roots))
+            positions = np.arange(len(nodes))
+            while len(nodes):
+                values = np.take(flat, np.take(self._feature, nodes) + offsets)
+                went_right = values > np.take(thresholds, nodes)
+                if has_nan:
+                    went_right |= np.isnan(values) & np.take(self._nan_right, nodes)
+                children = np.take(self._left, nodes)
+                children += went_right
+                internal = children != nodes
+                n_internal = np.count_nonzero(internal)
+                if n_internal <= len(nodes) // 2:
+                    block_leaves[positions] = children
+                    keep = np.flatnonzero(internal)
+                    nodes, offsets, positions = children[keep], offsets[keep], positions[keep]
+                else:
+                    nodes = children
+        return leaves
+
+    def _accumulate(self, X):
+        leaves = self._leaves(X)
+        total = np.zeros((len(self._values), leaves.shape[1]))
+        for tree_leaves in leaves:
+            total += np.take(self._values, tree_leaves, axis=1)
+        return total.transpose()
+
+    def predict_proba(self, X):
+        """Class probabilities: an (n_rows, n_classes) array, or a list of them for multi-output forests."""
+        total = self._accumulate(X)
+        if self.kind == 'gbdt':
+            if bool(self.arrays['average_output']):
+                total /= len(self._roots)
+            # NumPy's vectorized exp can differ from the C library exp LightGBM calls in the last bit, but the
+            # probability is above 0.5 exactly when the margin is positive either way, so the labels are unchanged
+            with np.errstate(over='ignore'):
+                positive = 1.0 / (1.0 + np.exp(-float(self.arrays['sigmoid']) * total[:, 0]))
+            return np.vstack((1.0 - positive, positive)).transpose()
+
+        total /= len(self._roots)
+        max_classes = self.n_classes.max()
+        probabilities = [total[:, output * max_classes:output * max_classes + n] for output, n in enumerate(self.n_classes)]
+        return probabilities[0] if len(probabilities) == 1 else probabilities
+
+    def predict(self, X):
+        """Predicted class labels, with the same tie-breaking as the source model."""
+        probabilities = self.predict_proba(X)
+        if isinstance(probabilities, list):
+            return np.stack([self.classes_[output][np.argmax(proba, axis=1)] for output, proba in enumerate(probabilities)], axis=1)
+        classes = self.classes_[0] if self.classes_.ndim > 1 else self.classes_
+        return classes[np.argmax(probabilities, axis=1)]
+
+class CompiledMultiOutput:
+    """Compiled counterpart of sklearn's MultiOutputClassifier: one compiled model per label column."""
+
+    def __init__(self, estimators):
+        self.estimators = estimators
+
+    def predict_proba(self, X):
+        return [estimator.predict_proba(X) for estimator in self.estimators]
+
+    def predict(self, X):
+        return np.stack([estimator.predict(X) for estimator in self.estimators], axis=1)
+
+def compile_model(model, scaler=None):
+    """Compiles a fitted RandomForestClassifier, binary LGBMClassifier or a MultiOutputClassifier of either.
+
+    The StandardScaler the model was trained behind is folded into the split thresholds, so the compiled model
+    takes unscaled features.
+    """
+    name = type(model).__name__
+    if name == 'MultiOutputClassifier':
+        return CompiledMultiOutput([compile_model(estimator, scaler) for estimator in model.estimators_])
+    if name in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        n_classes = np.atleast_1d(model.n_classes_)
+        classes = model.classes_ if model.n_outputs_ > 1 else [model.classes_]
+        padded = np.array([np.pad(np.asarray(c), (0, n_classes.max() - len(c)), mode='edge') for c in classes])
+        # sklearn trees compare float32 copies of the features
+        return CompiledTreeModel.from_nodes('forest', _flatten_sklearn_forest(model), padded, n_classes, model.n_features_in_,
+                                            scaler, np.float32)
+    if name == 'LGBMClassifier':
+        booster_dump = model.booster_.dump_model()
+        objective = booster_dump['objective'].split()
+        if objective[0] != 'binary' or booster_dump['num_tree_per_iteration'] != 1:
+            raise ValueError(f"Only binary LightGBM models are supported, got {booster_dump['objective']}")
+        sigmoid = next((float(part.split(':')[1]) for part in objective if part.startswith('sigmoid:')), 1.0)
+        return CompiledTreeModel.from_nodes('gbdt', _flatten_lightgbm(booster_dump), model.classes_, [len(model.classes_)],
+                                            booster_dump['max_feature_idx'] + 1, scaler, np.float64,
+                                            sigmoid=sigmoid, average_output=booster_dump['average_output'])
+    raise TypeError(f"Cannot compile {name}")
+
+def save_compiled_model(compiled, path):
+    """Saves a compiled model as a single .npz file of plain arrays (no pickles)."""
+    if isinstance(compiled, CompiledMultiOutput):
+        arrays = {f"estimator{i}/{key}": value for i, estimator in enumerate(compiled.estimators) for key, value in estimator.arrays.items()}
+        arrays['n_estimators'] = np.array(len(compiled.estimators))
+    else:
+        arrays = compiled.arrays
+    np.savez(path, **arrays)
+
+def load_compiled_model(path):
+    """Loads a model saved by save_compiled_model; only NumPy is needed."""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    if 'n_estimators' in arrays:
+        return CompiledMultiOutput([CompiledTreeModel({key.split('/', 1)[1]: value for key, value in arrays.items()
+                                                       if key.startswith(f"estimator{i}/")})
+                                    for i in range(int(arrays['n_estimators']))])
+    return CompiledTreeModel(arrays)
+
+def setup_arguments():
+    """Sets up command-line arguments for the script."""
+    parser = argparse.ArgumentParser(description="Compile a trained model and its scaler into a NumPy-only .npz model.")
+    parser.add_argument("model_path", help="Path to the ML model file.")
+    parser.add_argument("scaler_path", help="Path to the ML scaler file.")
+    parser.add_argument("output_path", help="Where to save the compiled model (.npz).")
+    parser.add_argument("--check-features", default=None,
+                        help="Unscaled feature matrix (.npy) to compare the compiled and original predictions on.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    import joblib
+
+    args = setup_arguments()
+    model, scaler = joblib.load(args.model_path), joblib.load(args.scaler_path)
+    compiled = compile_model(model, scaler)
+    save_compiled_model(compiled, args.output_path)
+    print(f"Saved compiled model to {args.output_path}")
+
+    if args.check_features:
+        features = np.load(args.check_features)
+        start = time.perf_counter()
+        expected = model.predict(scaler.transform(features))
+        original_time = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = load_compiled_model(args.output_path).predict(features)
+        compiled_time = time.perf_counter() - start
+        print(f"{int(np.sum(np.asarray(expected) != actual))} of {np.size(actual)} predictions differ | "
+              f"original {original_time * 1000:.1f} ms, compiled (including load) {compiled_time * 1000:.1f} ms")
@@ -0,0 +1,67 @@
+import os
+from pathlib import Path
+import pandas as pd
+
+LABEL_COLUMNS = ['Prolongation', 'Block', 'SoundRep', 'WordRep', 'Interjection']
+QUALITY_COLUMNS = ['NoSpeech', 'Music', 'Unsure', 'PoorAudioQuality']
+# Mean annotation count above which a clip is labelled not fluent
+STRICT_THRESHOLD = 0.5
+KIND_THRESHOLD = 0.7
+# The variants that used to be written to 'Speed Perturbed Clips' and 'Pitch Shifted Clips'; kept here rather than
+# in audio_augmentation so that listing the dataset does not import librosa
+SPEED_FACTORS = (0.75, 0.875, 1.125, 1.25)
+PITCH_SHIFTS = (-2, -1, 1, 2)
+
+def read_data(csv_path):
+    """Read the CSV file into a DataFrame."""
+    return pd.read_csv(csv_path)
+
+def remove_unwanted_rows(df, column, value):
+    """Remove rows where the column matches the specified value."""
+    return df[df[column] != value]
+
+def filter_clean_clips(df, columns=QUALITY_COLUMNS):
+    """Keep only clips that at most one annotator marked as no speech, music, unsure or poor audio quality."""
+    return df[df[columns].isin([0, 1]).all(axis=1)]
+
+def compute_fluency_label(df, columns=LABEL_COLUMNS, threshold=STRICT_THRESHOLD):
+    """Compute the fluency label column-wise.
+
+    Not Fluent/0: If any column has a 2 or 3, or the average is above threshold
+    Fluent/1: Otherwise
+    """
+    labels = df[columns]
+    not_fluent = labels.isin([2, 3]).any(axis=1) | (labels.mean(axis=1) > threshold)
+    df['Fluency Label'] = 1 - not_fluent.astype(int)
+    return df
+
+def _clip_paths(df, folder, zero_pad_episode=False):
+    """Builds '<folder>/<Show>/<EpId>/<Show>_<EpId>_<ClipId>.wav' for every row with vectorized string operations."""
+    show = df['Show'].astype(str)
+    episode = df['EpId'].astype(int).astype(str)
+    if zero_pad_episode:
+        episode = episode.str.zfill(3)
+    clip = df['ClipId'].astype(int).astype(str)
+    return str(Path(folder)) + os.sep + show + os.sep + episode + os.sep + show + '_' + episode + '_' + clip + '.wav'
+
+def generate_clip_paths(df, base_path):
+    """Generate file paths for SEP-28k audio clips based on DataFrame entries."""
+    df['ClipPath'] = _clip_paths(df, base_path)
+    return df
+
+def generate_clip_paths_fb(df, base_path):
+    """Generate file paths for FluencyBank audio clips, whose episode folders are zero-padded to three digits."""
+    df['ClipPath'] = _clip_paths(df, base_path, zero_pad_episode=True)
+    return df
+
+def generate_augmented_clip_paths(df, base_path, augmented_base_path, is_fluency_bank=False):
+    """Generate paths for both original and augmented audio clips.
+
+    Returns the original rows followed by one copy per speed factor and pitch shift, each pointing at its folder
+    under augmented_base_path.
+    """
+    augmented_base_path = Path(augmented_base_path)
+    folders = ([base_path] + [augmented_base_path / 'Speed Perturbed Clips' / str(factor) for factor in SPEED_FACTORS]
+               + [augmented_base_path / 'Pitch Shifted Clips' / f"pitch_{steps}" for steps in PITCH_SHIFTS])
+    df['ClipPath'] = _clip_paths(df, base_path, is_fluency_bank)
+    return pd.concat([df.assign(ClipPath=_clip_paths(df, folder, is_fluency_bank)) for folder in folders], ignore_index=True)
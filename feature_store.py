@@ -0,0 +1,196 @@
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
+import numpy as np
+from tqdm import tqdm
+import feature_extractor as fe
+
+# Bump when a change to feature_extractor alters the values an extractor produces
+FEATURE_STORE_VERSION = 1
+
+def hash_bytes(data):
+    """Returns a short hex digest identifying a block of audio content."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def hash_file(audio_path):
+    """Hashes the raw bytes of an audio file."""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(audio_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def hash_signal(audio_signal, sr):
+    """Hashes an in-memory signal together with its sample rate."""
+    return hash_bytes(np.ascontiguousarray(audio_signal, dtype=np.float32).tobytes() + str(sr).encode())
+
+def _extractor_settings(extraction_type, params):
+    """Returns the full set of extractor arguments, filling in the extractor's defaults for any not given."""
+    extractor = fe.extract_features_basic if extraction_type == 'basic' else fe.extract_features_advanced_batch
+    defaults = {name: parameter.default for name, parameter in inspect.signature(extractor).parameters.items()
+                if parameter.default is not inspect.Parameter.empty}
+    return {**defaults, **params}
+
+class FeatureStore:
+    """Persistent feature cache keyed by audio content hash, extractor name and extractor parameters.
+
+    Each extractor configuration gets its own directory under root holding a raw float32 matrix that is read
+    memory-mapped (features.f32), the content hash of every row (keys.txt) and its configuration (meta.json).
+    Rows are only ever appended, so only features for unseen keys are computed. A store directory must only be
+    written by one process at a time.
+    """
+
+    def __init__(self, root, extraction_type='advanced', **params):
+        self.extraction_type = extraction_type
+        self.params = params
+        config = {'extraction_type': extraction_type, 'params': params, 'version': FEATURE_STORE_VERSION}
+        config_key = hash_bytes(json.dumps(config, sort_keys=True).encode())[:12]
+        self.store_dir = Path(root) / f"{extraction_type}-{config_key}"
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        self._features_path = self.store_dir / 'features.f32'
+        self._keys_path = self.store_dir / 'keys.txt'
+        self._meta_path = self.store_dir / 'meta.json'
+        self._file_hashes_path = self.store_dir / 'file_hashes.json'
+
+        if self._meta_path.is_file():
+            with open(self._meta_path, 'r') as file:
+                self.n_features = json.load(file)['n_features']
+        else:
+            self.n_features = None
+        self._config = config
+
+        self._rows = {}
+        if self._keys_path.is_file():
+            with open(self._keys_path, 'r') as file:
+                self._rows = {key: row for row, key in enumerate(line.strip() for line in file)}
+        self._matrix = None
+
+        self._file_hashes = {}
+        if self._file_hashes_path.is_file():
+            with open(self._file_hashes_path, 'r') as file:
+                self._file_hashes = json.load(file)
+
+    def check_settings(self, extraction_type, **params):
+        """Raises ValueError unless features extracted with these settings are the ones this store holds.
+
+        Arguments left out on either side count as the extractor's defaults, so FeatureStore(root) matches
+        pitch_backend='piptrack' but not pitch_backend='yin'.
+        """
+        requested = _extractor_settings(extraction_type, params)
+        stored = _extractor_settings(self.extraction_type, self.params)
+        if extraction_type != self.extraction_type or requested != stored:
+            raise ValueError(f"FeatureStore at {self.store_dir} holds {self.extraction_type} features for {stored}, "
+                             f"but {extraction_type} features for {requested} were requested.")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def _features(self):
+        if self._matrix is None and self._rows:
+            self._matrix = np.memmap(self._features_path, dtype=np.float32, mode='r', shape=(len(self._rows), self.n_features))
+        return self._matrix
+
+    def lookup(self, keys):
+        """Returns a (len(keys), n_features) array of cached features and a boolean mask of the keys that are missing."""
+        missing = np.array([key not in self._rows for key in keys], dtype=bool)
+        if self.n_features is None:
+            return None, missing
+        features = np.zeros((len(keys), self.n_features), dtype=np.float32)
+        hits = np.flatnonzero(~missing)
+        if len(hits):
+            features[hits] = self._features()[[self._rows[keys[i]] for i in hits]]
+        return features, missing
+
+    def add(self, keys, features):
+        """Appends features for keys that are not already stored."""
+        features = np.asarray(features, dtype=np.float32)
+        if self.n_features is None:
+            self.n_features = features.shape[1]
+            with open(self._meta_path, 'w') as file:
+                json.dump(dict(self._config, n_features=self.n_features), file)
+
+        new_rows = []
+        for key, row in zip(keys, features):
+            if key not in self._rows:
+                self._rows[key] = len(self._rows)
+                new_rows.append((key, row))
+        if not new_rows:
+            return
+
+        # Drop any rows left behind by an interrupted write before appending
+        valid_size = (len(self._rows) - len(new_rows)) * self.n_features * 4
+        with open(self._features_path, 'ab') as file:
+            file.truncate(valid_size)
+            np.stack([row for _, row in new_rows]).tofile(file)
+        with open(self._keys_path, 'a') as file:
+            file.writelines(f"{key}\n" for key, _ in new_rows)
+        self._matrix = None
+
+    def hash_files(self, audio_paths):
+        """Returns the content hash of each file, reusing hashes of files whose size and mtime are unchanged."""
+        keys, changed = [], False
+        for audio_path in audio_paths:
+            stat = os.stat(audio_path)
+            cache_key = os.path.abspath(audio_path)
+            cached = self._file_hashes.get(cache_key)
+            if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+                keys.append(cached[2])
+            else:
+                key = hash_file(audio_path)
+                self._file_hashes[cache_key] = [stat.st_size, stat.st_mtime_ns, key]
+                keys.append(key)
+                changed = True
+        if changed:
+            with open(self._file_hashes_path, 'w') as file:
+                json.dump(self._file_hashes, file)
+        return keys
+
+    def get_or_compute_files(self, audio_paths, progress=True, n_workers=1, chunksize=16):
+        """Returns the feature matrix for a list of audio files, extracting features only for files not yet stored.
+
+        With n_workers other than 1, missing features are extracted in parallel by fe.extract_dataset_features.
+        """
+        audio_paths = list(audio_paths)
+        keys = self.hash_files(audio_paths)
+        features, missing = self.lookup(keys)
+        missing_indices = np.flatnonzero(missing)
+
+        if n_workers != 1 and len(missing_indices):
+            computed, errors = fe.extract_dataset_features([audio_paths[i] for i in missing_indices], self.extraction_type,
+                                                           n_workers, chunksize, progress, **self.params)
+            succeeded = [j for j in range(len(missing_indices)) if j not in errors]
+            if succeeded:
+                self.add([keys[missing_indices[j]] for j in succeeded], computed[succeeded])
+            if errors:
+                failures = "\n".join(f"{audio_paths[missing_indices[j]]}: {error}" for j, error in errors.items())
+                raise ValueError(f"Feature extraction failed for {len(errors)} files:\n{failures}")
+            return self.lookup(keys)[0]
+
+        pending_keys, pending_features = [], []
+        for i in tqdm(missing_indices, desc="Extracting features", disable=not progress):
+            pending_keys.append(keys[i])
+            pending_features.append(fe.load_audio_and_extract_features(audio_paths[i], self.extraction_type, **self.params))
+            # Persist in batches so an interrupted run keeps most of its work
+            if len(pending_keys) == 256:
+                self.add(pending_keys, pending_features)
+                pending_keys, pending_features = [], []
+        if pending_keys:
+            self.add(pending_keys, pending_features)
+
+        return self.lookup(keys)[0]
+
+    def get_or_compute_signals(self, audio_signals, sr, compute_features):
+        """Returns features for in-memory signals, calling compute_features(list_of_signals) only for unseen ones."""
+        keys = [hash_signal(audio_signal, sr) for audio_signal in audio_signals]
+        features, missing = self.lookup(keys)
+        missing_indices = np.flatnonzero(missing)
+        if len(missing_indices):
+            self.add([keys[i] for i in missing_indices], compute_features([audio_signals[i] for i in missing_indices]))
+            features, _ = self.lookup(keys)
+        return features
@@ -1,15 +1,15 @@
 import argparse
 import os
 import csv
-import shutil
 import numpy as np
 import pandas as pd
-import joblib
-import librosa
 import soundfile as sf
 from tqdm import tqdm
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import feature_extractor as fe
+import model_registry
+import audio_loader
+import audio_conditioning
 
 def split_audio_signal(y, sr, chunk_length=3):
     """Splits an audio signal into fixed-length chunks."""
@@ -17,8 +17,45 @@ def split_audio_signal(y, sr, chunk_length=3):
               for i in range(0, len(y), chunk_length * sr) if i + chunk_length * sr <= len(y)]
     return chunks
 
-def save_chunks_and_predict(chunks, chunks_dir, sr, model, scaler, update_progress_callback=None):
-    """Saves audio chunks to disk in 'fluent chunks' or 'dysfluent chunks' directories based on predictions."""
+def extract_chunk_features(chunks, sr, batch_size=64, update_progress_callback=None, feature_store=None, pitch_backend='piptrack'):
+    """Extracts the advanced feature matrix for all chunks, processing them in stacked batches.
+
+    If an 'advanced' FeatureStore is given, chunks whose audio has been seen before are read from it instead;
+    it must have been created with the same pitch backend.
+    """
+    if feature_store is not None:
+        feature_store.check_settings('advanced', pitch_backend=pitch_backend)
+    total_chunks = len(chunks)
+    feature_batches = []
+    for start in range(0, total_chunks, batch_size):
+        batch = [chunk for chunk, _ in chunks[start:start + batch_size]]
+        if feature_store is not None:
+            feature_batches.append(feature_store.get_or_compute_signals(
+                batch, sr, lambda signals: fe.extract_features_advanced_batch(np.stack(signals), sr, pitch_backend=pitch_backend)))
+        else:
+            feature_batches.append(fe.extract_features_advanced_batch(np.stack(batch), sr, pitch_backend=pitch_backend))
+
+        if update_progress_callback is not None:
+            update_progress_callback(min(start + batch_size, total_chunks), total_chunks)
+
+    return np.concatenate(feature_batches, axis=0)
+
+def predict_chunks(chunks, sr, model, scaler, batch_size=64, update_progress_callback=None, feature_store=None, pitch_backend='piptrack'):
+    """Predicts every chunk with a single scaler.transform and model.predict call over the whole feature matrix."""
+    if not chunks:
+        return np.array([])
+    features = extract_chunk_features(chunks, sr, batch_size, update_progress_callback, feature_store, pitch_backend)
+    scaled_features = scaler.transform(features)
+    return model.predict(scaled_features)
+
+def start_chunk_export(chunks, predictions, chunks_dir, sr, max_workers=4, executor=None):
+    """Writes chunks into 'fluent chunks' or 'dysfluent chunks' directories on a background thread pool.
+
+    Returns the pending write futures; pass them to wait_for_chunk_export before relying on the files.
+    A caller-owned executor can be passed in to share one writer pool across several calls.
+    """
+    assert sr == 16000, "Chunk sample rate is not 16 kHz"
+
     fluent_dir = os.path.join(chunks_dir, "fluent chunks")
     dysfluent_dir = os.path.join(chunks_dir, "dysfluent chunks")
 
@@ -26,38 +63,31 @@ def save_chunks_and_predict(chunks, chunks_dir, sr, model, scaler, update_progre
     os.makedirs(fluent_dir, exist_ok=True)
     os.makedirs(dysfluent_dir, exist_ok=True)
 
-    predictions, chunk_names = [], []
-    total_chunks = len(chunks)
-    for i, (chunk, index) in enumerate(chunks):
-        features = fe.extract_features_advanced(chunk, sr)
-        scaled_features = scaler.transform(np.array(features).reshape(1, -1))
-        prediction = model.predict(scaled_features)[0]
-        
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = []
+    for (chunk, index), prediction in zip(chunks, predictions):
         # Determine the target directory based on the prediction
         target_dir = fluent_dir if prediction == 1 else dysfluent_dir
-        chunk_name = f"chunk_{index}.wav"
-        chunk_path = os.path.join(target_dir, chunk_name)
-        
-        # Save the chunk in the respective directory
-        sf.write(chunk_path, chunk, sr)
-        y, chunk_sr = librosa.load(chunk_path, sr=None)
-        assert chunk_sr == 16000, "Chunk sample rate is not 16 kHz"
-        
-        predictions.append(prediction)
-        chunk_names.append(chunk_name)
-
-        if update_progress_callback is not None:
-            update_progress_callback(i + 1, total_chunks)
-
-    return predictions, chunk_names
+        chunk_path = os.path.join(target_dir, f"chunk_{index}.wav")
+        futures.append(executor.submit(sf.write, chunk_path, chunk, sr))
+    if owns_executor:
+        executor.shutdown(wait=False)
+    return futures
 
+def wait_for_chunk_export(futures):
+    """Blocks until all pending chunk writes have finished, re-raising the first write error."""
+    for future in futures:
+        future.result()
 
-def setup_output_directories(output_dir, audio_name):
-    """Sets up output directories for predictions and chunks."""
+def setup_output_directories(output_dir, audio_name, export_chunks=True):
+    """Sets up output directories for predictions and, if export_chunks is set, chunks."""
     prediction_output_dir = os.path.join(output_dir, audio_name)
     os.makedirs(prediction_output_dir, exist_ok=True)
     chunks_dir = os.path.join(prediction_output_dir, "chunks")
-    os.makedirs(chunks_dir, exist_ok=True)
+    if export_chunks:
+        os.makedirs(chunks_dir, exist_ok=True)
     return prediction_output_dir, chunks_dir
 
 def generate_fluency_score(predictions, chunk_names, prediction_output_dir):
@@ -66,67 +96,167 @@ def generate_fluency_score(predictions, chunk_names, prediction_output_dir):
     predictions_df.to_csv(os.path.join(prediction_output_dir, 'chunk_predictions.csv'), index=False)
     return np.mean(predictions)
 
-def predict_and_score(audio_path, model_path, scaler_path, output_dir, update_progress_callback=None):
-    """Main function to process audio and generate fluency score."""
-    y, sr = librosa.load(audio_path, sr=None)
+def predict_and_score(audio_path, model_path, scaler_path, output_dir, update_progress_callback=None, export_chunks=True, feature_store=None, pitch_backend='piptrack',
+                      rms_target=None):
+    """Main function to process audio and generate fluency score.
+
+    Audio in any other sample rate or channel layout is converted to 16 kHz mono in memory; the file is left untouched.
+    With export_chunks=False everything stays in memory and only chunk_predictions.csv is written.
+    With rms_target, each chunk is RMS normalized before feature extraction, for models trained on normalized clips;
+    exported chunks keep their original level.
+    """
+    y, sr = audio_loader.load_audio(audio_path)
     chunks = split_audio_signal(y, sr)
-    model = joblib.load(model_path)
-    scaler = joblib.load(scaler_path)
+    model, scaler = model_registry.load_model_and_scaler(model_path, scaler_path)
     audio_name = os.path.basename(audio_path).replace('.wav', '')
 
-    prediction_output_dir, chunks_dir = setup_output_directories(output_dir, audio_name)
-    predictions, chunk_names = save_chunks_and_predict(chunks, chunks_dir, sr, model, scaler, update_progress_callback)
+    prediction_output_dir, chunks_dir = setup_output_directories(output_dir, audio_name, export_chunks)
+    scored_chunks = chunks
+    if rms_target is not None and chunks:
+        normalized = audio_conditioning.normalize_rms(np.stack([chunk for chunk, _ in chunks]), rms_target)
+        scored_chunks = [(chunk, index) for chunk, (_, index) in zip(normalized, chunks)]
+    predictions = list(predict_chunks(scored_chunks, sr, model, scaler, update_progress_callback=update_progress_callback, feature_store=feature_store, pitch_backend=pitch_backend))
+    chunk_names = [f"chunk_{index}.wav" for _, index in chunks]
+
+    # Chunk files are written in the background while the CSV and score are produced
+    pending_writes = start_chunk_export(chunks, predictions, chunks_dir, sr) if export_chunks else []
     fluency_score = generate_fluency_score(predictions, chunk_names, prediction_output_dir)
+    wait_for_chunk_export(pending_writes)
     
     return fluency_score
 
-def convert_audio_to_mono_wav_safe(audio_path_orig):
-    """Converts an audio file to 16kHz mono WAV format, replacing the original file."""
+def sliding_window_starts(n_samples, sr, window_length=3, hop_length=0.5, pad_final=False):
+    """Returns the start sample of every (possibly overlapping) window of an n_samples long signal.
 
-    print("Converting the audio file to the correct format")
-    temp_wav_path = audio_path_orig + ".temp.wav"
-    ffmpeg_cmd = f"ffmpeg -y -i \"{audio_path_orig}\" -ac 1 -ar 16000 \"{temp_wav_path}\" -loglevel error"
-    
-    try:
-        subprocess.check_call(ffmpeg_cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-        # If conversion was successful, replace the original file with the converted one
-        shutil.move(temp_wav_path, audio_path_orig)
-    except subprocess.CalledProcessError:
-        print("Error during conversion. The original file has not been modified.")
-        # Remove the temporary file if the conversion failed
-        os.remove(temp_wav_path)
-
-def is_audio_in_target_format(audio_path, target_sr=16000, target_channels=1):
-    """Checks if the audio file is already in the target sample rate and channel configuration."""
-    y, sr = librosa.load(audio_path, sr=None, mono=False)
-    current_channels = 1 if len(y.shape) == 1 else y.shape[0]
-    
-    return sr == target_sr and current_channels == target_channels
+    With pad_final, one more window is added if needed so the trailing partial window is zero-padded and scored too.
+    """
+    window_samples, hop_samples = int(window_length * sr), int(round(hop_length * sr))
+    starts = list(range(0, max(n_samples - window_samples, -1) + 1, hop_samples))
+    if pad_final and n_samples > 0:
+        next_start = starts[-1] + hop_samples if starts else 0
+        if not starts or starts[-1] + window_samples < n_samples:
+            starts.append(next_start)
+    return np.array(starts, dtype=np.int64)
 
-def setup_arguments():
-    """Sets up command-line arguments for the script."""
-    parser = argparse.ArgumentParser(description="Generate fluency score from an audio clip.")
-    parser.add_argument("model_path", help="Path to the ML model file.")
-    parser.add_argument("scaler_path", help="Path to the ML scaler file.")
-    parser.add_argument("audio_clip_path", help="Path to the audio clip.")
-    parser.add_argument("output_dir", help="Directory to save output.")
-    return parser.parse_args()
+def sliding_window_features(y, sr, window_length=3, hop_length=0.5, pad_final=False, pitch_backend='piptrack',
+                            windows_per_block=256, update_progress_callback=None):
+    """Extracts advanced features for overlapping windows by averaging spectral frames computed once per block.
 
-def setupArgs(audio_clip_path, model_name = "combined-and-filtered-strict-Binary-RandF-gpu-optimised"):    
-    args = argparse.Namespace()
-    args.model_path = f"ML Models\\{model_name}\\model.joblib"
-    print(f"Using model: {model_name}")
-    args.scaler_path = f"ML Models\\{model_name}\\scaler.joblib"
-    args.audio_clip_path = audio_clip_path
-    args.output_dir = f"ML Models\\{model_name}"
-    return args
+    Frames shared by overlapping windows are only computed once and each window mean comes from prefix sums over
+    them, so a finer hop costs little extra feature work.
+    Returns the (n_windows, n_features) matrix and the start sample of each window.
+    """
+    _, frame_hop = fe.advanced_frame_parameters(sr)
+    if int(round(hop_length * sr)) % frame_hop:
+        raise ValueError(f"The window hop must be a multiple of the {frame_hop / sr * 1000:g} ms frame hop.")
 
-if __name__ == "__main__":
-    
-    models = ['Kind-Binary-RandF-simple', 'Kind-Binary-RandF-gpu-optimised', 'Strict-Binary-RandF-gpu-optimised', 'combined-and-filtered-strict-Binary-RandF-gpu-optimised', 'combined-augmented-and-filtered-strict-Binary-RandF-gpu-optimised']
-    clips = ['Evaluation/Audio Tests/How Placebo Effects Work to Change Our Biology & Psychology - 10 min.wav', 'Evaluation/Audio Tests/My Stuttering Life Podcast Presents - My Journey From PWS To PWSS.wav', 'Evaluation/Audio Tests/rupert-s-story-stuttering-and-building-community-in-academia - 10 mins.wav']
+    starts = sliding_window_starts(len(y), sr, window_length, hop_length, pad_final)
+    window_frames = 1 + int(window_length * sr) // frame_hop
+    start_frames = starts // frame_hop
+
+    feature_blocks = []
+    for block in range(0, len(starts), windows_per_block):
+        block_starts = start_frames[block:block + windows_per_block]
+        first_frame = block_starts[0]
+        frames = fe.frame_feature_matrix(y, sr, first_frame, block_starts[-1] + window_frames, pitch_backend=pitch_backend)
+        frame_means = fe.aggregate_frames(frames, block_starts - first_frame, window_frames, axis=0)
+        feature_blocks.append(fe.advanced_features_from_frame_means(frame_means))
+
+        if update_progress_callback is not None:
+            update_progress_callback(min(block + windows_per_block, len(starts)), len(starts))
+
+    features = np.concatenate(feature_blocks, axis=0) if feature_blocks else np.empty((0, 0), dtype=np.float32)
+    return features, starts
+
+def predict_and_score_sliding(audio_path, model_path, scaler_path, output_dir, window_length=3, hop_length=0.5, pad_final=False,
+                              update_progress_callback=None, pitch_backend='piptrack'):
+    """Scores overlapping windows for finer time resolution and returns the mean prediction as the fluency score.
+
+    chunk_predictions.csv gains Start and End columns (in seconds) for each window.
+    """
+    y, sr = audio_loader.load_audio(audio_path)
+    model, scaler = model_registry.load_model_and_scaler(model_path, scaler_path)
+    audio_name = os.path.basename(audio_path).replace('.wav', '')
+    prediction_output_dir, _ = setup_output_directories(output_dir, audio_name, export_chunks=False)
 
-    output_dir = "Evaluation"    
+    features, starts = sliding_window_features(y, sr, window_length, hop_length, pad_final, pitch_backend,
+                                               update_progress_callback=update_progress_callback)
+    predictions = model.predict(scaler.transform(features)) if len(starts) else np.array([])
+
+    predictions_df = pd.DataFrame({'ChunkName': [f"window_{i}" for i in range(len(starts))],
+                                   'Start': starts / sr,
+                                   'End': np.minimum(starts / sr + window_length, len(y) / sr),
+                                   'Prediction': predictions})
+    predictions_df.to_csv(os.path.join(prediction_output_dir, 'chunk_predictions.csv'), index=False)
+    return np.mean(predictions)
+
+def stream_audio_chunks(audio_path, chunk_length=3):
+    """Reads an audio file block by block and yields (chunk, index) pairs of fixed-length 16 kHz mono chunks.
+
+    Audio at other sample rates is resampled block by block to the same samples load_audio produces. Like
+    split_audio_signal, the trailing partial chunk is dropped. Only a few chunks are held in memory at a time.
+    """
+    chunk_samples = chunk_length * audio_loader.TARGET_SR
+    for index, block in enumerate(audio_loader.stream_audio(audio_path, chunk_samples)):
+        if len(block) < chunk_samples:
+            break
+        yield block, index
+
+def score_audio_stream(audio_path, model, scaler, chunk_length=3, batch_size=64, feature_store=None, pitch_backend='piptrack'):
+    """Yields (chunk, index, prediction) for each chunk of an audio file as soon as its batch has been scored."""
+    sr = audio_loader.TARGET_SR
+    batch = []
+    for chunk in stream_audio_chunks(audio_path, chunk_length):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield from zip(batch, predict_chunks(batch, sr, model, scaler, batch_size, feature_store=feature_store, pitch_backend=pitch_backend))
+            batch = []
+    if batch:
+        yield from zip(batch, predict_chunks(batch, sr, model, scaler, batch_size, feature_store=feature_store, pitch_backend=pitch_backend))
+
+def predict_and_score_streaming(audio_path, model_path, scaler_path, output_dir, update_progress_callback=None, export_chunks=True, batch_size=64, feature_store=None, pitch_backend='piptrack'):
+    """Streaming variant of predict_and_score that keeps memory flat regardless of recording length.
+
+    Audio is converted to 16 kHz mono block by block. Rows are appended to chunk_predictions.csv as each batch of chunks is scored; the final score matches predict_and_score.
+    """
+    frames, orig_sr = audio_loader.read_audio_length(audio_path)
+    sr = audio_loader.TARGET_SR
+    # Length after resampling, as resample_poly rounds it up
+    total_chunks = -(-frames * sr // orig_sr) // (3 * sr)
+    model, scaler = model_registry.load_model_and_scaler(model_path, scaler_path)
+    audio_name = os.path.basename(audio_path).replace('.wav', '')
+
+    prediction_output_dir, chunks_dir = setup_output_directories(output_dir, audio_name, export_chunks)
+    executor = ThreadPoolExecutor(max_workers=4) if export_chunks else None
+    pending_writes = []
+    prediction_total, chunk_count = 0, 0
+
+    with open(os.path.join(prediction_output_dir, 'chunk_predictions.csv'), mode='w', newline='') as file:
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(['ChunkName', 'Prediction'])
+        for (chunk, index), prediction in score_audio_stream(audio_path, model, scaler, batch_size=batch_size, feature_store=feature_store, pitch_backend=pitch_backend):
+            writer.writerow([f"chunk_{index}.wav", prediction])
+            if export_chunks:
+                pending_writes.extend(start_chunk_export([(chunk, index)], [prediction], chunks_dir, sr, executor=executor))
+                # Drop finished writes so their chunk buffers can be freed
+                pending_writes = [future for future in pending_writes if not future.done() or future.exception()]
+
+            prediction_total += prediction
+            chunk_count += 1
+            if update_progress_callback is not None:
+                update_progress_callback(chunk_count, total_chunks)
+
+    if executor is not None:
+        executor.shutdown(wait=True)
+    wait_for_chunk_export(pending_writes)
+
+    return prediction_total / chunk_count if chunk_count else np.nan
+
+EVALUATION_MODELS = ['Kind-Binary-RandF-simple', 'Kind-Binary-RandF-gpu-optimised', 'Strict-Binary-RandF-gpu-optimised', 'combined-and-filtered-strict-Binary-RandF-gpu-optimised', 'combined-augmented-and-filtered-strict-Binary-RandF-gpu-optimised']
+EVALUATION_CLIPS = ['Evaluation/Audio Tests/How Placebo Effects Work to Change Our Biology & Psychology - 10 min.wav', 'Evaluation/Audio Tests/My Stuttering Life Podcast Presents - My Journey From PWS To PWSS.wav', 'Evaluation/Audio Tests/rupert-s-story-stuttering-and-building-community-in-academia - 10 mins.wav']
+
+def evaluate_models(output_dir="Evaluation", models=EVALUATION_MODELS, clips=EVALUATION_CLIPS):
+    """Scores every evaluation clip with every model and writes the table to model_audio_fluency_scores.csv."""
     output_csv_path = os.path.join(output_dir, "model_audio_fluency_scores.csv")
 
     with open(output_csv_path, mode='w', newline='') as file:
@@ -139,25 +269,82 @@ if __name__ == "__main__":
                 # Update paths to model and scaler according to the current model
                 model_path = f"ML Models/{model_name}/model.joblib"
                 scaler_path = f"ML Models/{model_name}/scaler.joblib"
-                audio_clip_path = clip_path
 
-                # Convert audio to mono WAV if needed and predict fluency score
-                if not is_audio_in_target_format(audio_clip_path):
-                    convert_audio_to_mono_wav_safe(audio_clip_path)
-
-                fluency_score = predict_and_score(audio_clip_path, model_path, scaler_path, output_dir)
+                # Audio is converted to 16 kHz mono in memory if needed
+                fluency_score = predict_and_score(clip_path, model_path, scaler_path, output_dir)
                 writer.writerow([model_name, clip_path, fluency_score])
 
     # Print the results table from the CSV
     with open(output_csv_path, mode='r') as file:
         print(file.read())
 
-def ui_integrator(audio_clip_path, update_progress_callback):
+def setup_arguments():
+    """Sets up command-line arguments for the script."""
+    parser = argparse.ArgumentParser(description="Generate fluency score from an audio clip.")
+    parser.add_argument("model_path", nargs='?', help="Path to the ML model file.")
+    parser.add_argument("scaler_path", nargs='?', help="Path to the ML scaler file.")
+    parser.add_argument("audio_clip_path", nargs='?', help="Path to the audio clip.")
+    parser.add_argument("output_dir", nargs='?', help="Directory to save output.")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="Instead of scoring one clip, score the evaluation clips with every evaluation model into Evaluation/.")
+    parser.add_argument("--no-chunks", dest="export_chunks", action="store_false",
+                        help="Only write chunk_predictions.csv instead of exporting every chunk as a WAV.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Read and score the audio block by block so memory use does not grow with its length.")
+    parser.add_argument("--window-hop", type=float, default=None,
+                        help="Score overlapping 3 s windows with this hop in seconds (e.g. 0.5) instead of back-to-back chunks.")
+    parser.add_argument("--pad-final", action="store_true",
+                        help="With --window-hop, zero-pad and score the trailing partial window.")
+    parser.add_argument("--pitch-backend", default='piptrack', choices=fe.PITCH_BACKENDS,
+                        help="Pitch estimator the model was trained with.")
+    parser.add_argument("--rms-target", type=float, default=None,
+                        help="RMS normalize each chunk to this level before scoring (e.g. 0.05), for models trained on normalized clips.")
+    args = parser.parse_args()
+
+    if not args.evaluate and args.output_dir is None:
+        parser.error("model_path, scaler_path, audio_clip_path and output_dir are required unless --evaluate is given.")
+    if args.streaming and args.window_hop is not None:
+        parser.error("--streaming and --window-hop cannot be combined.")
+    if args.pad_final and args.window_hop is None:
+        parser.error("--pad-final only applies with --window-hop.")
+    if args.rms_target is not None and (args.streaming or args.window_hop is not None):
+        parser.error("--rms-target is only supported when scoring back-to-back chunks without --streaming.")
+    return args
+
+def setupArgs(audio_clip_path, model_name = "combined-and-filtered-strict-Binary-RandF-gpu-optimised"):    
+    args = argparse.Namespace()
+    args.model_path = f"ML Models\\{model_name}\\model.joblib"
+    print(f"Using model: {model_name}")
+    args.scaler_path = f"ML Models\\{model_name}\\scaler.joblib"
+    args.audio_clip_path = audio_clip_path
+    args.output_dir = f"ML Models\\{model_name}"
+    return args
+
+if __name__ == "__main__":
+    args = setup_arguments()
+
+    if args.evaluate:
+        evaluate_models()
+    else:
+        if args.window_hop is not None:
+            fluency_score = predict_and_score_sliding(args.audio_clip_path, args.model_path, args.scaler_path, args.output_dir,
+                                                      hop_length=args.window_hop, pad_final=args.pad_final,
+                                                      pitch_backend=args.pitch_backend)
+        elif args.streaming:
+            fluency_score = predict_and_score_streaming(args.audio_clip_path, args.model_path, args.scaler_path, args.output_dir,
+                                                        export_chunks=args.export_chunks, pitch_backend=args.pitch_backend)
+        else:
+            fluency_score = predict_and_score(args.audio_clip_path, args.model_path, args.scaler_path, args.output_dir,
+                                              export_chunks=args.export_chunks, pitch_backend=args.pitch_backend,
+                                              rms_target=args.rms_target)
+        print(f"Fluency score: {fluency_score}")
+
+def ui_integrator(audio_clip_path, update_progress_callback, export_chunks=True):
     args = setupArgs(audio_clip_path)
 
-    if not is_audio_in_target_format(args.audio_clip_path):
-        convert_audio_to_mono_wav_safe(args.audio_clip_path)
+    if not audio_loader.is_audio_in_target_format(args.audio_clip_path):
+        print("Converting the audio to 16 kHz mono in memory")
     else:
         print("Audio file is already in the target format. No conversion needed.")
 
-    return predict_and_score(args.audio_clip_path, args.model_path, args.scaler_path, args.output_dir, update_progress_callback)
\ No newline at end of file
+    return predict_and_score(args.audio_clip_path, args.model_path, args.scaler_path, args.output_dir, update_progress_callback, export_chunks)
\ No newline at end of file
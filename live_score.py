@@ -0,0 +1,226 @@
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+import numpy as np
+import audio_loader
+import feature_extractor as fe
+import model_registry
+
+SAMPLE_FORMATS = {'s16le': np.dtype('<i2'), 'f32le': np.dtype('<f4')}
+
+class RingBuffer:
+    """Fixed-capacity mono sample buffer filled by a stream reader thread and read by the scorer.
+
+    Samples are addressed by their absolute position in the stream. Once more than capacity samples have been
+    written the oldest are overwritten, so a scorer that falls behind loses audio rather than latency.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.written = 0
+        self.closed = False
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        self._arrivals = deque()
+        self._condition = threading.Condition()
+
+    def write(self, samples):
+        """Appends samples, recording when they arrived."""
+        with self._condition:
+            n_samples = len(samples)
+            samples = samples[-self.capacity:]
+            position = (self.written + n_samples - len(samples)) % self.capacity
+            head = min(len(samples), self.capacity - position)
+            self._buffer[position:position + head] = samples[:head]
+            self._buffer[:len(samples) - head] = samples[head:]
+            self.written += n_samples
+            self._arrivals.append((self.written, time.monotonic()))
+            while len(self._arrivals) > 1 and self._arrivals[1][0] <= self.written - self.capacity:
+                self._arrivals.popleft()
+            self._condition.notify_all()
+
+    def close(self):
+        """Marks the end of the stream."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def wait_for(self, end):
+        """Blocks until sample end has been written and returns its arrival time, or None if the stream ended first."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.written >= end or self.closed)
+            if self.written < end:
+                return None
+            return next(arrival for written, arrival in self._arrivals if written >= end)
+
+    def oldest(self):
+        """Returns the position of the oldest sample still held."""
+        with self._condition:
+            return max(0, self.written - self.capacity)
+
+    def read(self, start, length):
+        """Returns a copy of samples [start, start + length), or None if some of them have been overwritten."""
+        with self._condition:
+            if start < self.written - self.capacity or start + length > self.written:
+                return None
+            indices = np.arange(start, start + length) % self.capacity
+            return self._buffer[indices]
+
+def open_pcm_source(source):
+    """Opens '-' (stdin), tcp://HOST:PORT (waits for one client to connect) or a file/FIFO path as a binary stream."""
+    if source == '-':
+        return sys.stdin.buffer
+    if source.startswith('tcp://'):
+        host, port = source[len('tcp://'):].rsplit(':', 1)
+        with socket.create_server((host, int(port))) as server:
+            print(f"Waiting for a PCM stream on {source}", file=sys.stderr)
+            connection, _ = server.accept()
+        return connection.makefile('rb')
+    return open(source, 'rb')
+
+def decode_pcm_blocks(stream, sample_format='s16le', channels=1, block_bytes=4096):
+    """Yields mono float32 blocks decoded from raw interleaved PCM until the stream ends."""
+    dtype = SAMPLE_FORMATS[sample_format]
+    frame_bytes = dtype.itemsize * channels
+    read = getattr(stream, 'read1', stream.read)
+    pending = b''
+    while True:
+        data = read(block_bytes)
+        if not data:
+            break
+        pending += data
+        usable = len(pending) - len(pending) % frame_bytes
+        if not usable:
+            continue
+        samples = np.frombuffer(pending[:usable], dtype=dtype).reshape(-1, channels)
+        pending = pending[usable:]
+        if sample_format == 's16le':
+            samples = samples / np.float32(32768)
+        yield np.mean(samples, axis=1, dtype=np.float32)
+
+def read_pcm_stream(stream, ring_buffer, sample_format='s16le', channels=1, sr=audio_loader.TARGET_SR, block_bytes=4096):
+    """Decodes raw interleaved PCM at sr from stream into the ring buffer as 16 kHz mono until the stream ends."""
+    try:
+        for block in audio_loader.resample_blocks(decode_pcm_blocks(stream, sample_format, channels, block_bytes), sr):
+            ring_buffer.write(block)
+    finally:
+        ring_buffer.close()
+
+def score_live_stream(stream, model, scaler, sr=16000, window_length=3, hop_length=None, sample_format='s16le', channels=1,
+                      buffer_seconds=30, pitch_backend='piptrack'):
+    """Scores each completed window of a live PCM stream and yields one result dict per window as soon as it is scored.
+
+    Windows are back-to-back 3 s chunks like predict_and_score unless hop_length is given. Latency is measured from
+    the arrival of a window's last sample to its prediction. If scoring falls more than buffer_seconds behind the
+    stream, the overwritten windows are skipped and counted in 'dropped'. sr is the stream's sample rate; other
+    rates are resampled to 16 kHz as they arrive, holding back a few samples until the next read.
+    """
+    stream_sr, sr = sr, audio_loader.TARGET_SR
+    window_samples = int(window_length * sr)
+    hop_samples = int((hop_length or window_length) * sr)
+    ring_buffer = RingBuffer(max(int(buffer_seconds * sr), window_samples))
+    # The first extraction compiles librosa's numba kernels; do it before audio starts arriving
+    model.predict(scaler.transform(fe.extract_features_advanced_batch(np.zeros((1, window_samples), dtype=np.float32), sr,
+                                                                      pitch_backend=pitch_backend)))
+    reader = threading.Thread(target=read_pcm_stream, args=(stream, ring_buffer, sample_format, channels, stream_sr), daemon=True)
+    reader.start()
+
+    index, prediction_total, scored, dropped = 0, 0.0, 0, 0
+    while True:
+        start = index * hop_samples
+        arrival = ring_buffer.wait_for(start + window_samples)
+        if arrival is None:
+            break
+        window = ring_buffer.read(start, window_samples)
+        if window is None:
+            # Jump to the oldest window still in the buffer
+            skip_to = -(-ring_buffer.oldest() // hop_samples)
+            dropped += skip_to - index
+            index = skip_to
+            continue
+
+        processing_start = time.monotonic()
+        features = fe.extract_features_advanced_batch(window[np.newaxis], sr, pitch_backend=pitch_backend)
+        prediction = model.predict(scaler.transform(features))[0]
+        done = time.monotonic()
+
+        prediction_total += prediction
+        scored += 1
+        yield {
+            'chunk': f"chunk_{index}.wav",
+            'start': start / sr,
+            'end': (start + window_samples) / sr,
+            'prediction': prediction.item(),
+            'fluency_score': prediction_total / scored,
+            'latency_ms': (done - arrival) * 1000,
+            'processing_ms': (done - processing_start) * 1000,
+            'dropped': dropped,
+        }
+        index += 1
+
+def feed_audio(audio_path, stream, sr=16000, block_seconds=0.1, realtime=True):
+    """Writes an audio file to stream as mono s16le PCM, paced at real time unless realtime is False.
+
+    A local stand-in for a microphone when testing the live scorer.
+    """
+    y, _ = audio_loader.load_audio(audio_path, sr)
+    pcm = (np.clip(y, -1, 1 - 1 / 32768) * 32768).astype('<i2')
+    block = int(block_seconds * sr)
+    start_time = time.monotonic()
+    for start in range(0, len(pcm), block):
+        if realtime:
+            time.sleep(max(0.0, start_time + start / sr - time.monotonic()))
+        stream.write(pcm[start:start + block].tobytes())
+        stream.flush()
+
+def summarize_latency(results, hop_seconds):
+    """Returns a one-line latency and throughput summary for the scored windows."""
+    if not results:
+        return "No complete windows were scored."
+    latency = np.array([result['latency_ms'] for result in results])
+    processing = np.array([result['processing_ms'] for result in results])
+    return (f"{len(results)} windows, {results[-1]['dropped']} dropped | latency mean {latency.mean():.1f} ms, "
+            f"p95 {np.percentile(latency, 95):.1f} ms, max {latency.max():.1f} ms | "
+            f"real-time factor {processing.mean() / (hop_seconds * 1000):.3f}")
+
+def setup_arguments():
+    """Sets up command-line arguments for the script."""
+    parser = argparse.ArgumentParser(description="Score a live PCM audio stream, or feed an audio file as one.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    score_parser = subparsers.add_parser("score", help="Score a live PCM stream and print one JSON line per window.")
+    score_parser.add_argument("model_path", help="Path to the ML model file.")
+    score_parser.add_argument("scaler_path", help="Path to the ML scaler file.")
+    score_parser.add_argument("--source", default='-', help="'-' for stdin, tcp://HOST:PORT to listen for a connection, or a file/FIFO path.")
+    score_parser.add_argument("--sr", type=int, default=16000, help="Sample rate of the stream; it is resampled to 16 kHz for scoring.")
+    score_parser.add_argument("--format", dest="sample_format", default='s16le', choices=list(SAMPLE_FORMATS), help="PCM sample format.")
+    score_parser.add_argument("--channels", type=int, default=1, help="Interleaved channels in the stream; they are downmixed.")
+    score_parser.add_argument("--window-hop", type=float, default=None, help="Score overlapping 3 s windows with this hop in seconds.")
+    score_parser.add_argument("--buffer-seconds", type=float, default=30, help="Audio kept while scoring catches up; older windows are dropped.")
+    score_parser.add_argument("--pitch-backend", default='piptrack', choices=fe.PITCH_BACKENDS, help="Pitch estimator the model was trained with.")
+
+    feed_parser = subparsers.add_parser("feed", help="Write an audio file to stdout as mono s16le PCM.")
+    feed_parser.add_argument("audio_path", help="Path to the audio file.")
+    feed_parser.add_argument("--sr", type=int, default=16000, help="Sample rate to resample to.")
+    feed_parser.add_argument("--fast", dest="realtime", action="store_false", help="Write as fast as possible instead of in real time.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = setup_arguments()
+    if args.command == "feed":
+        feed_audio(args.audio_path, sys.stdout.buffer, args.sr, realtime=args.realtime)
+    else:
+        model, scaler = model_registry.load_model_and_scaler(args.model_path, args.scaler_path)
+        results = []
+        try:
+            for result in score_live_stream(open_pcm_source(args.source), model, scaler, args.sr, hop_length=args.window_hop,
+                                            sample_format=args.sample_format, channels=args.channels,
+                                            buffer_seconds=args.buffer_seconds, pitch_backend=args.pitch_backend):
+                results.append(result)
+                print(json.dumps(result), flush=True)
+        except KeyboardInterrupt:
+            pass
+        print(summarize_latency(results, args.window_hop or 3), file=sys.stderr)
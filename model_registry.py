@@ -0,0 +1,78 @@
+import os
+import threading
+from collections import OrderedDict
+import joblib
+from compiled_model import IDENTITY_SCALER, load_compiled_model
+
+# Written next to model.joblib by compiled_model.py; preferred when present
+COMPILED_MODEL_FILE = "model.npz"
+
+class ModelRegistry:
+    """Keeps deserialized models and scalers resident in memory, keyed by file path.
+
+    Entries are evicted least-recently-used once more than max_entries are held, and a file is reloaded
+    automatically when its modification time changes. With mmap_mode='r', large numpy arrays inside the
+    joblib files (e.g. random forest node arrays) are memory-mapped so several processes share one copy.
+    .npz paths are loaded as compiled models (see compiled_model.py).
+    """
+
+    def __init__(self, max_entries=8, mmap_mode=None):
+        self.max_entries = max_entries
+        self.mmap_mode = mmap_mode
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Returns the object stored at path, loading it only if it is not cached or has changed on disk."""
+        key = os.path.abspath(path)
+        mtime = os.path.getmtime(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+            obj = load_compiled_model(key) if key.endswith('.npz') else joblib.load(key, mmap_mode=self.mmap_mode)
+            self._entries[key] = (mtime, obj)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return obj
+
+    def load_model_and_scaler(self, model_path, scaler_path):
+        """Returns the (model, scaler) pair for a model directory's joblib files.
+
+        A compiled .npz model already includes its scaler, so it is paired with a pass-through scaler.
+        """
+        if model_path.endswith('.npz'):
+            return self.get(model_path), IDENTITY_SCALER
+        return self.get(model_path), self.get(scaler_path)
+
+    def load_model_dir(self, model_dir):
+        """Returns the (model, scaler) pair of a model directory, using its compiled model if one was saved."""
+        compiled_path = os.path.join(model_dir, COMPILED_MODEL_FILE)
+        model_path = compiled_path if os.path.exists(compiled_path) else os.path.join(model_dir, "model.joblib")
+        return self.load_model_and_scaler(model_path, os.path.join(model_dir, "scaler.joblib"))
+
+    def evict(self, path):
+        """Drops a single cached entry."""
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def clear(self):
+        """Drops every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+# Shared registry used by the scoring entry points
+default_registry = ModelRegistry()
+
+def load_model_and_scaler(model_path, scaler_path):
+    """Returns the cached (model, scaler) pair from the shared registry."""
+    return default_registry.load_model_and_scaler(model_path, scaler_path)
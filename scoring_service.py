@@ -0,0 +1,204 @@
+import argparse
+import io
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import audio_loader
+import generate_fluency_score as gfs
+from model_registry import ModelRegistry
+
+class MicroBatcher:
+    """Collects chunk feature matrices from concurrent requests and scores them with one model.predict call.
+
+    A batch is flushed once it holds max_batch_rows chunks or max_wait seconds after its first request arrived.
+    """
+
+    def __init__(self, model, scaler, max_batch_rows=512, max_wait=0.01):
+        self.model = model
+        self.scaler = scaler
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        """Queues a (n_chunks, n_features) matrix and returns a Future resolving to its predictions."""
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            rows = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+            self._predict(pending)
+
+    def _predict(self, pending):
+        try:
+            features = np.concatenate([features for features, _ in pending], axis=0)
+            predictions = self.model.predict(self.scaler.transform(features))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for features, future in pending:
+            future.set_result(predictions[offset:offset + len(features)])
+            offset += len(features)
+
+class ScoringService:
+    """Keeps models warm and scores audio through one MicroBatcher per model."""
+
+    def __init__(self, model_dirs, max_batch_rows=512, max_wait=0.01):
+        registry = ModelRegistry(max_entries=2 * len(model_dirs))
+        self.batchers = {}
+        for model_dir in model_dirs:
+            model_name = os.path.basename(os.path.normpath(model_dir))
+            model, scaler = registry.load_model_dir(model_dir)
+            self.batchers[model_name] = MicroBatcher(model, scaler, max_batch_rows, max_wait)
+        self.default_model = next(iter(self.batchers))
+
+    def score_signal(self, y, sr, model_name=None):
+        """Scores a mono signal and returns the per-chunk predictions and the fluency score."""
+        model_name = model_name or self.default_model
+        if model_name not in self.batchers:
+            raise KeyError(f"Unknown model: {model_name}")
+
+        chunks = gfs.split_audio_signal(y, sr)
+        if chunks:
+            features = gfs.extract_chunk_features(chunks, sr)
+            predictions = self.batchers[model_name].submit(features).result()
+        else:
+            predictions = np.array([])
+
+        return {
+            'model': model_name,
+            'fluency_score': float(np.mean(predictions)) if len(predictions) else None,
+            'chunks': [{'chunk': f"chunk_{index}.wav", 'prediction': prediction.item()}
+                       for (_, index), prediction in zip(chunks, predictions)],
+        }
+
+    def score_file(self, audio_path, model_name=None):
+        """Scores an audio file on the local filesystem, converted to 16 kHz mono in memory."""
+        y, sr = audio_loader.load_audio(audio_path)
+        return self.score_signal(y, sr, model_name)
+
+    def score_bytes(self, audio_bytes, model_name=None):
+        """Scores an uploaded audio file held in memory, converted to 16 kHz mono."""
+        y, sr = audio_loader.load_audio(io.BytesIO(audio_bytes))
+        return self.score_signal(y, sr, model_name)
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API:
+
+    GET  /health                           -> {"status": "ok"}
+    GET  /models                           -> {"models": [...], "default": ...}
+    POST /score?model=NAME  (audio body)   -> score an uploaded audio file
+    POST /score  {"audio_path": ..., "model": ...} (JSON body) -> score a local file
+    """
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif path == '/models':
+            self._send_json(200, {'models': list(self.server.service.batchers), 'default': self.server.service.default_model})
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/score':
+            self._send_json(404, {'error': 'Not found'})
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        model_name = parse_qs(url.query).get('model', [None])[0]
+        try:
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                request = json.loads(body)
+                result = self.server.service.score_file(request['audio_path'], request.get('model', model_name))
+            else:
+                result = self.server.service.score_bytes(body, model_name)
+        except KeyError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+        else:
+            self._send_json(200, result)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if self.client_address else self.server.server_address
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def create_server(service, host='127.0.0.1', port=8765, unix_socket=None, quiet=False):
+    """Creates (but does not start) an HTTP server bound to a TCP port or a Unix socket."""
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, ScoringRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+    server.service = service
+    server.quiet = quiet
+    return server
+
+def setup_arguments():
+    """Sets up command-line arguments for the script."""
+    parser = argparse.ArgumentParser(description="Run a local fluency scoring service that keeps models loaded.")
+    parser.add_argument("--models", nargs='+', required=True,
+                        help="Model directories, each containing model.joblib and scaler.joblib. The first is the default.")
+    parser.add_argument("--host", default='127.0.0.1', help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--unix-socket", default=None, help="Listen on this Unix socket instead of a TCP port.")
+    parser.add_argument("--max-batch-rows", type=int, default=512, help="Maximum chunks per model.predict call.")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="How long a batch waits for more requests.")
+    parser.add_argument("--quiet", action="store_true", help="Don't log each request.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = setup_arguments()
+    service = ScoringService(args.models, args.max_batch_rows, args.max_wait_ms / 1000)
+    server = create_server(service, args.host, args.port, args.unix_socket, args.quiet)
+    print(f"Serving models {list(service.batchers)} on {args.unix_socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_loader
+
+def _unreadable_by_soundfile(monkeypatch, path):
+    """Makes soundfile refuse path, as it does for M4A, so audioread has to decode it."""
+    real_soundfile = sf.SoundFile
+
+    class SoundFile(real_soundfile):
+        def __init__(self, file, mode='r', *args, **kwargs):
+            if str(file) == str(path) and mode == 'r':
+                raise sf.LibsndfileError(0, prefix="Error opening: ")
+            super().__init__(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(sf, 'SoundFile', SoundFile)
+
+def test_length_and_stream_fall_back_when_soundfile_cannot_open(tmp_path, monkeypatch):
+    path = tmp_path / "clip.wav"
+    t = np.arange(int(44100 * 2.5)) / 44100
+    sf.write(path, np.stack([np.sin(2 * np.pi * 220 * t)] * 2, axis=1) * 0.1, 44100, subtype='PCM_16')
+    expected, _ = audio_loader.load_audio(path)
+    _unreadable_by_soundfile(monkeypatch, path)
+
+    assert audio_loader.read_audio_length(path) == (len(t), 44100)
+    streamed = np.concatenate(list(audio_loader.stream_audio(path, 16000)))
+    np.testing.assert_allclose(streamed, expected, atol=1e-6)
+
+def test_streaming_score_falls_back_when_soundfile_cannot_open(tmp_path, monkeypatch):
+    from joblib import dump
+    from sklearn.dummy import DummyClassifier
+    from sklearn.preprocessing import StandardScaler
+    import generate_fluency_score as gfs
+
+    path = tmp_path / "clip.wav"
+    sf.write(path, 0.1 * np.random.default_rng(0).standard_normal(44100 * 7), 44100, subtype='PCM_16')
+    features = np.zeros((2, 1), dtype=np.float32)
+    dump(DummyClassifier(strategy='constant', constant=1).fit(features, [0, 1]), tmp_path / "model.joblib")
+    dump(StandardScaler(with_mean=False, with_std=False).fit(features), tmp_path / "scaler.joblib")
+    monkeypatch.setattr(gfs, 'extract_chunk_features', lambda chunks, *args, **kwargs: np.zeros((len(chunks), 1), dtype=np.float32))
+    _unreadable_by_soundfile(monkeypatch, path)
+
+    score = gfs.predict_and_score_streaming(str(path), str(tmp_path / "model.joblib"), str(tmp_path / "scaler.joblib"),
+                                            str(tmp_path / "out"), export_chunks=False)
+    assert score == 1
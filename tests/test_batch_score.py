@@ -0,0 +1,56 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import soundfile as sf
+from joblib import dump
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_score
+import generate_fluency_score as gfs
+
+def _tone(sr, seconds, frequency):
+    t = np.arange(int(sr * seconds)) / sr
+    return (0.1 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+def _model_dir(tmp_path):
+    chunks = gfs.split_audio_signal(np.concatenate([_tone(16000, 6, 150), _tone(16000, 6, 300)]), 16000)
+    features = gfs.extract_chunk_features(chunks, 16000)
+    scaler = StandardScaler().fit(features)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(features), np.arange(len(features)) % 2)
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    dump(model, model_dir / "model.joblib")
+    dump(scaler, model_dir / "scaler.joblib")
+    return model_dir
+
+def test_interrupted_parquet_run_resumes_from_its_part_files(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    model_dir = _model_dir(tmp_path)
+    audio_paths = []
+    for index in range(3):
+        path = tmp_path / f"clip{index}.wav"
+        sf.write(path, _tone(16000, 6, 150 + 50 * index), 16000)
+        audio_paths.append(str(path))
+    output_path = str(tmp_path / "results.parquet")
+
+    def interrupted_tqdm(futures, **kwargs):
+        yield next(iter(futures))
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch_score, 'tqdm', interrupted_tqdm)
+    with pytest.raises(KeyboardInterrupt):
+        batch_score.batch_score(audio_paths, [str(model_dir)], output_path, n_workers=1, parquet_part_files=1)
+    assert not os.path.exists(output_path)
+    _, completed = batch_score.load_completed(output_path, ["model"])
+    assert len(completed) == 1
+
+    monkeypatch.undo()
+    batch_score.batch_score(audio_paths, [str(model_dir)], output_path, n_workers=1, resume=True, parquet_part_files=1)
+    results = pd.read_parquet(output_path)
+    assert sorted(results["Audio Clip"]) == audio_paths
+    assert not batch_score.parquet_parts_dir(output_path).exists()
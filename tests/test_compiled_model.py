@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compiled_model as cm
+
+def _data():
+    rng = np.random.default_rng(0)
+    X = (rng.normal(size=(1500, 12)) * rng.uniform(0.1, 50, 12)).astype(np.float32)
+    y = (X[:, 0] / X[:, 0].std() + X[:, 1] / X[:, 1].std() + rng.normal(size=len(X)) > 0).astype(int)
+    queries = X[:600].copy()
+    queries[::9, 0] = np.nan
+    return X, y, StandardScaler().fit(X), queries
+
+def test_compiled_forest_matches_sklearn_exactly(tmp_path):
+    X, y, scaler, queries = _data()
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(scaler.transform(X), y)
+    path = tmp_path / "model.npz"
+    cm.save_compiled_model(cm.compile_model(model, scaler), path)
+    compiled = cm.load_compiled_model(path)
+
+    for features in (queries, queries.astype(np.float64)):
+        np.testing.assert_array_equal(compiled.predict_proba(features), model.predict_proba(scaler.transform(features)))
+        np.testing.assert_array_equal(compiled.predict(features), model.predict(scaler.transform(features)))
+    # pairs_per_block only changes how the trees are walked
+    np.testing.assert_array_equal(compiled._leaves(queries, pairs_per_block=1), compiled._leaves(queries))
+
+def test_compiled_lightgbm_matches_labels_and_raw_scores():
+    lgb = pytest.importorskip("lightgbm")
+    X, y, scaler, queries = _data()
+    model = lgb.LGBMClassifier(n_estimators=30, verbose=-1).fit(scaler.transform(X), y)
+    compiled = cm.compile_model(model, scaler)
+
+    np.testing.assert_array_equal(compiled.predict(queries), model.predict(scaler.transform(queries)))
+    np.testing.assert_array_equal(compiled._accumulate(queries)[:, 0], model.predict(scaler.transform(queries), raw_score=True))
+    np.testing.assert_allclose(compiled.predict_proba(queries), model.predict_proba(scaler.transform(queries)), rtol=1e-15, atol=1e-15)
+
+def test_unsupported_models_raise_type_error():
+    X, y, scaler, _ = _data()
+    with pytest.raises(TypeError):
+        cm.compile_model(LogisticRegression().fit(X, y))
+    with pytest.raises(TypeError):
+        cm.compile_model(RandomForestClassifier(n_estimators=2).fit(X, y), scaler=object())
@@ -0,0 +1,90 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Data"))
+
+import download_audio_updated as download
+
+def _fixture_audio():
+    t = np.arange(int(44100 * 2.5)) / 44100
+    signal = 0.1 * np.sin(2 * np.pi * 220 * t)
+    audio = io.BytesIO()
+    sf.write(audio, np.stack([signal, signal], axis=1), 44100, subtype='PCM_16', format='WAV')
+    return audio.getvalue()
+
+class FixtureServer:
+    """Serves fixture bytes over local HTTP with Range support; fail_first answers the first request with a 503."""
+
+    def __init__(self, body, fail_first=False):
+        self.body, self.fail_first, self.requests = body, fail_first, []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.headers.get('Range'))
+                if server.fail_first and len(server.requests) == 1:
+                    self.send_error(503)
+                    return
+                start = int(self.headers['Range'][len('bytes='):].rstrip('-')) if self.headers.get('Range') else 0
+                self.send_response(206 if start else 200)
+                if start:
+                    self.send_header('Content-Range', f"bytes {start}-{len(server.body) - 1}/{len(server.body)}")
+                self.send_header('Content-Length', str(len(server.body) - start))
+                self.end_headers()
+                self.wfile.write(server.body[start:])
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/episode.mp3"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def test_download_verifies_size_and_checksum(tmp_path):
+    body = _fixture_audio()
+    with FixtureServer(body) as server:
+        size, digest = download.download_file(server.url, tmp_path / "ep.mp3", hashlib.sha256(body).hexdigest())
+    assert (size, digest) == (len(body), hashlib.sha256(body).hexdigest())
+    assert (tmp_path / "ep.mp3").read_bytes() == body
+    assert not (tmp_path / "ep.mp3.part").exists()
+
+def test_download_resumes_from_part_file(tmp_path):
+    body = _fixture_audio()
+    (tmp_path / "ep.mp3.part").write_bytes(body[:1000])
+    with FixtureServer(body) as server:
+        download.download_file(server.url, tmp_path / "ep.mp3", hashlib.sha256(body).hexdigest())
+    assert server.requests == ["bytes=1000-"]
+    assert (tmp_path / "ep.mp3").read_bytes() == body
+
+def test_download_retries_and_rejects_bad_checksum(tmp_path):
+    body = _fixture_audio()
+    with FixtureServer(body, fail_first=True) as server:
+        with pytest.raises(IOError, match="Checksum mismatch"):
+            download.download_file(server.url, tmp_path / "ep.mp3", "0" * 64, retries=1, backoff=0)
+    assert len(server.requests) == 2
+    assert not (tmp_path / "ep.mp3").exists() and not (tmp_path / "ep.mp3.part").exists()
+
+def test_episodes_are_downloaded_transcoded_and_recorded(tmp_path):
+    body = _fixture_audio()
+    with FixtureServer(body) as server:
+        table = np.array([["Show", "0", server.url, "SH", "7"]])
+        failures = download.download_episodes(table, str(tmp_path), connections=2, transcode_workers=1)
+    assert failures == 0
+    wav, sr = sf.read(tmp_path / "SH" / "7.wav")
+    assert sr == 16000 and len(wav) == int(2.5 * 16000)
+    assert not (tmp_path / "SH" / "7.mp3").exists()
+    assert '"sha256": "' + hashlib.sha256(body).hexdigest() in (tmp_path / "manifest.jsonl").read_text()
@@ -0,0 +1,30 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feature_extractor as fe
+
+def test_yin_treats_silence_as_unvoiced():
+    sr = 16000
+    _, hop_length = fe.advanced_frame_parameters(sr)
+    f0, voicing = fe.estimate_pitch_yin(np.zeros((2, 3 * sr), dtype=np.float32), sr, hop_length)
+    assert not f0.any()
+    assert not voicing.any()
+
+def test_yin_pitch_features_of_silence_match_piptrack():
+    sr = 16000
+    signal = np.zeros(3 * sr, dtype=np.float32)
+    yin = fe.extract_features_advanced_batch(signal[np.newaxis], sr, pitch_backend='yin')
+    piptrack = fe.extract_features_advanced_batch(signal[np.newaxis], sr, pitch_backend='piptrack')
+    np.testing.assert_array_equal(yin, piptrack)
+
+def test_yin_still_tracks_a_tone_after_silence():
+    sr = 16000
+    _, hop_length = fe.advanced_frame_parameters(sr)
+    t = np.arange(sr) / sr
+    signal = np.concatenate([np.zeros(sr), 0.1 * np.sin(2 * np.pi * 200 * t)]).astype(np.float32)
+    f0, _ = fe.estimate_pitch_yin(signal, sr, hop_length)
+    assert not f0[:len(f0) // 2 - 10].any()
+    np.testing.assert_allclose(np.median(f0[-len(f0) // 4:]), 200, rtol=0.02)
@@ -0,0 +1,66 @@
+import io
+import json
+import os
+import sys
+import threading
+import urllib.request
+import numpy as np
+import soundfile as sf
+from joblib import dump
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_loader
+import generate_fluency_score as gfs
+import scoring_service
+
+def _tone(sr, seconds=7.0):
+    t = np.arange(int(sr * seconds)) / sr
+    return (0.1 * np.sin(2 * np.pi * 180 * t) + 0.01 * np.random.default_rng(0).standard_normal(len(t))).astype(np.float32)
+
+def _model_dir(tmp_path):
+    chunks = gfs.split_audio_signal(_tone(16000), 16000)
+    features = gfs.extract_chunk_features(chunks, 16000)
+    scaler = StandardScaler().fit(features)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(features), np.arange(len(features)) % 2)
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    dump(model, model_dir / "model.joblib")
+    dump(scaler, model_dir / "scaler.joblib")
+    return model_dir
+
+def test_upload_at_44100_hz_is_scored_at_16_khz(tmp_path, monkeypatch):
+    service = scoring_service.ScoringService([str(_model_dir(tmp_path))])
+    seen = []
+    extract = gfs.extract_chunk_features
+    monkeypatch.setattr(gfs, 'extract_chunk_features',
+                        lambda chunks, sr, *args, **kwargs: seen.append((sr, [len(chunk) for chunk, _ in chunks])) or extract(chunks, sr, *args, **kwargs))
+
+    upload = io.BytesIO()
+    sf.write(upload, np.stack([_tone(44100)] * 2, axis=1), 44100, format='WAV')
+    server = scoring_service.create_server(service, port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}/score", data=upload.getvalue(),
+                                         headers={'Content-Type': 'audio/wav'}, method='POST')
+        with urllib.request.urlopen(request, timeout=60) as response:
+            result = json.load(response)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # The expected result scores the upload decoded the same way: downmixed and resampled to 16 kHz
+    decoded, sr = audio_loader.load_audio(io.BytesIO(upload.getvalue()))
+    expected = service.score_signal(decoded, sr)
+    assert seen[0] == (16000, [3 * 16000, 3 * 16000])
+    assert [chunk['prediction'] for chunk in result['chunks']] == [chunk['prediction'] for chunk in expected['chunks']]
+    assert result['fluency_score'] == expected['fluency_score']
+
+    # And the same predictions as calling the model directly, without the micro-batcher
+    batcher = service.batchers[service.default_model]
+    predictions = batcher.model.predict(batcher.scaler.transform(extract(gfs.split_audio_signal(decoded, sr), sr)))
+    assert [chunk['prediction'] for chunk in result['chunks']] == predictions.tolist()
+    assert result['fluency_score'] == float(np.mean(predictions))